@@ -0,0 +1,254 @@
+"""Benchmark harness for photo rendering, encoding and handler dispatch.
+
+Times the photo generators (render vs. encode, output size, peak RSS and
+Python heap) and drives every registered callback action end-to-end against a
+recording fake of the bot, then prints the results as JSON:
+
+    python bench.py --iterations 20 --output bench_output.txt
+    python bench.py --compare bench_output.txt
+
+With --compare the run is diffed against an earlier result file, and the
+exit status is 1 if any median time regressed by more than --threshold.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+os.environ.setdefault("BOT_TOKEN", "000000:BENCHMARK")
+os.environ.setdefault("RENDER_WORKERS", "0")
+# Handlers are driven far faster than any real user; measure them, not the rate limiter
+for _limit in ("RATE_LIMIT_USER", "RATE_LIMIT_CHAT", "RATE_LIMIT_GLOBAL"):
+    os.environ.setdefault(_limit, "0")
+# The settings actions write settings; keep them out of the deployment's databases
+os.environ.setdefault("SETTINGS_BACKEND", "memory")
+os.environ.setdefault("STATE_BACKEND", "memory")
+
+import main  # noqa: E402
+import memprobe  # noqa: E402
+
+PHOTO_TYPES = ["front", "back", "selfie"]
+
+RENDERERS = {
+    "front": (main.generate_front_camera_photo, main.render_front_camera_image),
+    "back": (main.generate_back_camera_photo, main.render_back_camera_image),
+    "selfie": (main.generate_selfie_photo, main.render_selfie_image),
+}
+
+USER_INFO = "Bench User (@bench_user)"
+# Synthetic user the handlers run as, clear of real user and admin ids
+BENCH_USER_ID = 10 ** 12
+
+
+# ===== RECORDING BOT =====
+class RecordingBot:
+    """Stands in for telebot.TeleBot: records every API call and the bytes it would upload"""
+
+    def __init__(self):
+        self.calls = []
+        self._message_id = 0
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            self.calls.append((method, _payload_size(args, kwargs)))
+            return self._response(method, args)
+        return call
+
+    def _response(self, method, args):
+        if method == "send_media_group":
+            return [self._message(photo=True) for _ in args[1]]
+        if method in ("send_photo", "send_message", "edit_message_text"):
+            return self._message(photo=method == "send_photo")
+        return True
+
+    def _message(self, photo=False):
+        self._message_id += 1
+        file_id = f"BENCH_{self._message_id}"
+        return SimpleNamespace(
+            message_id=self._message_id,
+            photo=[SimpleNamespace(file_id=file_id)] if photo else None,
+        )
+
+    def reset(self):
+        self.calls.clear()
+
+
+def _payload_size(args, kwargs):
+    size = 0
+    for value in list(args) + list(kwargs.values()):
+        if hasattr(value, "getbuffer"):
+            with value.getbuffer() as view:
+                size += len(view)
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value)
+        elif isinstance(value, list):
+            size += sum(len(item.media.getbuffer()) for item in value if isinstance(getattr(item, "media", None), io.BytesIO))
+    return size
+
+
+def _fake_call(data, user_id):
+    user = SimpleNamespace(id=user_id, first_name="Bench", username="bench_user", is_bot=False)
+    message = SimpleNamespace(
+        chat=SimpleNamespace(id=user_id, type="private"),
+        message_id=1,
+        from_user=user,
+        text=f"/{data}",
+    )
+    return SimpleNamespace(id="bench", data=data, from_user=user, message=message)
+
+
+# ===== MEASUREMENT =====
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        "min_ms": round(samples[0] * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "p90_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.9))] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def bench_photos(iterations, warmup, profile):
+    results = {}
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    for photo_type in PHOTO_TYPES:
+        generate, render = RENDERERS[photo_type]
+        for _ in range(warmup):
+            generate(USER_INFO, profile=profile)
+
+        render_times, encode_times, total_times, sizes = [], [], [], []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            img = render(USER_INFO, now=now)
+            rendered = time.perf_counter()
+            data = main.encode_image(img, photo_type, profile)
+            encoded = time.perf_counter()
+            render_times.append(rendered - start)
+            encode_times.append(encoded - rendered)
+            total_times.append(encoded - start)
+            sizes.append(len(data.getbuffer()))
+
+        results[f"generate_{photo_type}"] = {
+            "render": _summary(render_times),
+            "encode": _summary(encode_times),
+            "total": _summary(total_times),
+            "output_bytes": int(statistics.median(sizes)),
+            **memprobe.peak_memory(lambda: generate(USER_INFO, profile=profile)),
+        }
+
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            main.generate_random_photo(photo_type, USER_INFO, profile=profile)
+            samples.append(time.perf_counter() - start)
+        results[f"generate_random_photo[{photo_type}]"] = {"total": _summary(samples)}
+    return results
+
+
+def bench_handlers(iterations, warmup):
+    fake = RecordingBot()
+    real_bot, main.bot = main.bot, fake
+    real_notifier_bot, main.admin_notifier.bot = main.admin_notifier.bot, fake
+    user_id = BENCH_USER_ID
+    results = {}
+    try:
+        handler = main.handle_auto_actions
+        for data in main.ACTIONS:
+            for _ in range(warmup):
+                handler(_fake_call(data, user_id))
+
+            samples = []
+            fake.reset()
+            for _ in range(iterations):
+                call = _fake_call(data, user_id)
+                start = time.perf_counter()
+                handler(call)
+                samples.append(time.perf_counter() - start)
+
+            calls = {}
+            for method, _ in fake.calls:
+                calls[method] = calls.get(method, 0) + 1
+            results[data] = {
+                "total": _summary(samples),
+                "api_calls_per_update": {method: count / iterations for method, count in calls.items()},
+                "upload_bytes_per_update": sum(size for _, size in fake.calls) // iterations,
+                **memprobe.peak_memory(lambda: handler(_fake_call(data, user_id))),
+            }
+    finally:
+        main.bot = real_bot
+        main.admin_notifier.bot = real_notifier_bot
+    return results
+
+
+def run(iterations, warmup, profile):
+    main.warm_background_cache()
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "iterations": iterations,
+            "profile": profile or main.OUTPUT_PROFILE,
+        },
+        "photos": bench_photos(iterations, warmup, profile),
+        "handlers": bench_handlers(iterations, warmup),
+    }
+
+
+# ===== COMPARISON =====
+def compare(current, baseline, threshold):
+    """Return (report lines, regressed) comparing median times against a baseline run"""
+    lines, regressed = [], False
+    for section in ("photos", "handlers"):
+        for name, result in current[section].items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            for phase in ("render", "encode", "total"):
+                if phase not in result or phase not in before:
+                    continue
+                old, new = before[phase]["median_ms"], result[phase]["median_ms"]
+                change = (new - old) / old if old else 0.0
+                flag = ""
+                if change > threshold:
+                    flag, regressed = "  REGRESSION", True
+                lines.append(f"{section}/{name}/{phase}: {old:.3f} -> {new:.3f} ms ({change:+.1%}){flag}")
+    return lines, regressed
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--profile", default=None, choices=sorted(main.OUTPUT_PROFILES))
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed median slowdown (default 10%%)")
+    args = parser.parse_args(argv)
+
+    result = run(args.iterations, args.warmup, args.profile)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        lines, regressed = compare(result, baseline, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
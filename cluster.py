@@ -0,0 +1,149 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Update fields whose "from" user identifies who an update belongs to
+USER_FIELDS = (
+    "message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+    "shipping_query", "pre_checkout_query", "poll_answer", "my_chat_member", "chat_member",
+    "chat_join_request", "message_reaction",
+)
+
+
+def _hash(value):
+    # Stable across processes and machines, unlike hash()
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+
+def update_user_id(update):
+    """User id of a raw update dict, falling back to its chat id or update id"""
+    for field in USER_FIELDS:
+        body = update.get(field)
+        if not body:
+            continue
+        user = body.get("from") or body.get("user")
+        if user and "id" in user:
+            return user["id"]
+        chat = body.get("chat") or (body.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+    return update.get("update_id", 0)
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes, with `replicas` virtual points per node.
+
+    A key always maps to the same node, and adding or removing a node only
+    moves the keys of that node, so the ring can later span several hosts.
+    """
+
+    def __init__(self, nodes, replicas=64):
+        self._points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self._hashes = [point for point, _ in self._points]
+
+    def node_for(self, key):
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._points)
+        return self._points[index][1]
+
+
+class KeyedWorkers:
+    """Threads that run handler(item) with items of one key always on the same thread, in order."""
+
+    def __init__(self, handler, workers=8, max_queue=100, name="keyed-worker"):
+        self.handler = handler
+        self._queues = [queue.Queue(maxsize=max_queue) for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._run, args=(q,), name=f"{name}-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, item):
+        """Queue an item behind earlier items with the same key (blocks while that queue is full)"""
+        self._queues[_hash(key) % len(self._queues)].put(item)
+
+    def _run(self, items):
+        while True:
+            item = items.get()
+            if item is None:
+                break
+            try:
+                self.handler(item)
+            except Exception as e:
+                logger.error(f"Keyed worker failed: {e}")
+
+    def stop(self, timeout=None):
+        """Finish queued items, then stop the threads"""
+        for items in self._queues:
+            items.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+class WorkerCluster:
+    """Fans raw updates out from one ingress to worker processes by user id.
+
+    Each process gets its own bounded multiprocessing queue and runs
+    `target(index, queue)` until it reads None. Updates are routed with a
+    HashRing over the worker indexes, so one user's updates always reach
+    the same process in the order they arrived.
+    """
+
+    def __init__(self, target, workers=2, max_queue=1000, start_method="spawn"):
+        self.target = target
+        self.workers = workers
+        self.max_queue = max_queue
+        self.context = multiprocessing.get_context(start_method)
+        self.ring = HashRing(range(workers))
+        self._queues = []
+        self._processes = []
+        self._lock = threading.Lock()
+        self._stats = {"dispatched": 0, "shed": 0}
+
+    def start(self):
+        for index in range(self.workers):
+            updates = self.context.Queue(maxsize=self.max_queue)
+            process = self.context.Process(target=self.target, args=(index, updates), name=f"bot-worker-{index}")
+            process.start()
+            self._queues.append(updates)
+            self._processes.append(process)
+        logger.info(f"Started {self.workers} worker processes")
+        return self
+
+    def submit(self, update, timeout=None):
+        """Route a raw update dict to its user's worker; False if that queue stayed full past `timeout`"""
+        index = self.ring.node_for(update_user_id(update))
+        try:
+            self._queues[index].put(update, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self._stats["shed"] += 1
+            return False
+        with self._lock:
+            self._stats["dispatched"] += 1
+        return True
+
+    def stop(self, timeout=30.0):
+        """Let every worker finish its queue, terminating any still running after `timeout`"""
+        deadline = time.monotonic() + timeout
+        for updates in self._queues:
+            updates.put(None)
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Worker process {process.name} did not stop in time, terminating")
+                process.terminate()
+        self._queues, self._processes = [], []
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["alive"] = sum(process.is_alive() for process in self._processes)
+        return stats
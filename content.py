@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import random
+import threading
+from collections import deque
+
+from lazy import optional_module
+
+# Optional and loaded on first use: without NumPy batches are drawn one value at a time
+np = optional_module("numpy")
+
+logger = logging.getLogger(__name__)
+
+DEVICES = ["iPhone 15 Pro", "Samsung Galaxy S24", "Google Pixel 8", "OnePlus 12"]
+OS_VERSIONS = ["iOS 17.2", "Android 14", "HarmonyOS 4.0"]
+
+
+# ===== RANDOM SOURCES =====
+def seed_value(seed):
+    """Non-negative int seed for `seed`: decimal strings as is, anything else hashed (None stays None)"""
+    if seed is None:
+        return None
+    text = str(seed).strip()
+    if text.isdigit():
+        return int(text)
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def make_rng(seed=None, stream=0):
+    """NumPy Generator (or random.Random) for one pool; `stream` keeps seeded pools independent"""
+    seed = seed_value(seed)
+    if np is not None:
+        return np.random.default_rng(None if seed is None else [seed, stream])
+    return random.Random(None if seed is None else f"{seed}|{stream}")
+
+
+def _uniform(rng, low, high, n, digits):
+    if np is not None:
+        return rng.uniform(low, high, n).round(digits).tolist()
+    return [round(rng.uniform(low, high), digits) for _ in range(n)]
+
+
+def _integers(rng, low, high, n):
+    """n integers in [low, high], both inclusive like random.randint"""
+    if np is not None:
+        return rng.integers(low, high + 1, n).tolist()
+    return [rng.randint(low, high) for _ in range(n)]
+
+
+def _choices(rng, options, n):
+    return [options[i] for i in _integers(rng, 0, len(options) - 1, n)]
+
+
+# ===== BATCH GENERATORS =====
+# Each returns n ready-to-format tuples drawn from `rng`.
+def location_batch(rng, n):
+    """(latitude, longitude) pairs"""
+    return list(zip(_uniform(rng, -90, 90, n, 6), _uniform(rng, -180, 180, n, 6)))
+
+
+def contact_batch(rng, n):
+    """(phone number, email) pairs"""
+    area, line, mailbox = _integers(rng, 200, 999, n), _integers(rng, 1000000, 9999999, n), _integers(rng, 1000, 9999, n)
+    return [(f"+1{a}{b}", f"user{c}@example.com") for a, b, c in zip(area, line, mailbox)]
+
+
+def device_batch(rng, n):
+    """(device, OS version, battery %, signal bars, storage GB) tuples"""
+    return list(zip(
+        _choices(rng, DEVICES, n),
+        _choices(rng, OS_VERSIONS, n),
+        _integers(rng, 20, 100, n),
+        _integers(rng, 1, 5, n),
+        _integers(rng, 32, 512, n),
+    ))
+
+
+# ===== POOLS =====
+class ContentPool:
+    """Queue of pre-generated items, refilled a batch at a time.
+
+    take() pops one item; when fewer than `low_water` remain a background
+    thread appends the next batch. Batches are drawn from the pool's own RNG
+    strictly in order, so a seeded pool yields the same sequence every run.
+    If the pool runs dry and the inline fill fails, take() raises.
+    """
+
+    def __init__(self, name, batch, batch_size=512, low_water=128, seed=None, stream=0):
+        if batch_size < 1:
+            raise ValueError(f"Content pool {name}: batch_size must be at least 1, got {batch_size}")
+        self.name = name
+        self.batch = batch
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.seed = seed_value(seed)
+        self.stream = stream
+        self.rng = None
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._fill_lock = threading.Lock()
+        self._refilling = False
+        self._stats = {"taken": 0, "batches": 0, "empty": 0}
+
+    def fill(self):
+        """Append one batch; the RNG is only ever created and used under the fill lock"""
+        with self._fill_lock:
+            if self.rng is None:
+                self.rng = make_rng(self.seed, self.stream)
+            items = self.batch(self.rng, self.batch_size)
+            with self._lock:
+                self._items.extend(items)
+                self._stats["batches"] += 1
+
+    def _refill(self):
+        try:
+            self.fill()
+        except Exception as e:
+            logger.error(f"Refilling content pool {self.name} failed: {e}")
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def take(self):
+        while True:
+            with self._lock:
+                item = self._items.popleft() if self._items else None
+                refill = len(self._items) < self.low_water and not self._refilling
+                if refill:
+                    self._refilling = True
+                if item is not None:
+                    self._stats["taken"] += 1
+                else:
+                    self._stats["empty"] += 1
+            if item is None:
+                # Ran dry: fill inline rather than wait for the refill thread; a failure propagates
+                try:
+                    self.fill()
+                finally:
+                    if refill:
+                        with self._lock:
+                            self._refilling = False
+                continue
+            if refill:
+                threading.Thread(target=self._refill, name=f"content-{self.name}", daemon=True).start()
+            return item
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["available"] = len(self._items)
+        return stats
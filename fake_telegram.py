@@ -0,0 +1,199 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Auto Bot", "username": "auto_test_bot"}
+
+
+class FakeTelegramAPI:
+    """Local stand-in for the Telegram Bot API.
+
+    Answers the Bot API methods this bot uses with well-formed responses and
+    records every call, so the bot can be exercised end-to-end without
+    reaching api.telegram.org:
+
+        api = FakeTelegramAPI().start()
+        configure_http_pool(api_url=api.api_url)
+
+    With record_calls=False only per-method counts are kept, so long load
+    runs do not accumulate every request's parameters.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, record_calls=True):
+        self.latency = latency
+        self.record_calls = record_calls
+        self.counts = {}
+        self.calls = []
+        self._lock = threading.Lock()
+        self._message_id = 0
+        self._file_id = 0
+        self._updates = []
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        """URL template for telebot.apihelper.API_URL"""
+        return self.base_url + "/bot{0}/{1}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="fake-telegram", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def push_update(self, update):
+        """Queue a raw update dict to be returned by getUpdates"""
+        with self._lock:
+            self._updates.append(update)
+
+    def calls_to(self, method):
+        with self._lock:
+            return [params for name, params in self.calls if name == method]
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.counts.clear()
+
+    # ===== RESPONSES =====
+    def _next_message_id(self):
+        with self._lock:
+            self._message_id += 1
+            return self._message_id
+
+    def _next_file_id(self):
+        with self._lock:
+            self._file_id += 1
+            return f"FAKE_FILE_{self._file_id}"
+
+    def _message(self, params, **extra):
+        chat_id = params.get("chat_id", 0)
+        message = {
+            "message_id": self._next_message_id(),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0, "type": "private"},
+            "from": BOT_USER,
+        }
+        message.update(extra)
+        return message
+
+    def _photo(self, size):
+        file_id = self._next_file_id()
+        return [{"file_id": file_id, "file_unique_id": file_id, "width": 1080, "height": 1920, "file_size": size}]
+
+    def _result(self, method, params, files):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            with self._lock:
+                updates, self._updates = self._updates, []
+            return updates
+        if method in ("sendMessage", "editMessageText"):
+            return self._message(params, text=params.get("text", ""))
+        if method == "sendPhoto":
+            size = len(files.get("photo", b""))
+            return self._message(params, photo=self._photo(size), caption=params.get("caption"))
+        if method == "sendMediaGroup":
+            media = json.loads(params.get("media", "[]"))
+            return [
+                self._message(params, photo=self._photo(len(files.get(item["media"].replace("attach://", ""), b""))))
+                for item in media
+            ]
+        return True
+
+    # ===== HTTP SIDE =====
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._handle()
+
+            def do_POST(self):
+                self._handle()
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                method = url.path.rsplit("/", 1)[-1]
+                params = dict(parse_qsl(url.query))
+                files = {}
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                if content_type.startswith("multipart/form-data"):
+                    parsed = BytesParser(policy=HTTP).parsebytes(
+                        f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+                    for part in parsed.iter_parts():
+                        name = part.get_param("name", header="content-disposition")
+                        payload = part.get_payload(decode=True) or b""
+                        if part.get_filename() is not None:
+                            files[name] = payload
+                        else:
+                            params[name] = payload.decode()
+                elif content_type.startswith("application/x-www-form-urlencoded"):
+                    params.update(parse_qsl(body.decode()))
+                elif content_type.startswith("application/json") and body:
+                    params.update(json.loads(body))
+
+                with api._lock:
+                    api.counts[method] = api.counts.get(method, 0) + 1
+                    if api.record_calls:
+                        api.calls.append((method, params))
+                if api.latency:
+                    time.sleep(api.latency)
+
+                payload = json.dumps({"ok": True, "result": api._result(method, params, files)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+
+def serve(host="127.0.0.1", port=0, latency=0.0, record_calls=True, ready=None):
+    """Run a FakeTelegramAPI until interrupted; calls ready(api_url) once it is listening"""
+    api = FakeTelegramAPI(host, port, latency=latency, record_calls=record_calls)
+    if ready is not None:
+        ready(api.api_url)
+    try:
+        api.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Telegram Bot API for local runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every API call")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    serve(
+        args.host, args.port, latency=args.latency, record_calls=False,
+        ready=lambda api_url: print(f"Fake Bot API listening, run the bot with TELEGRAM_API_URL={api_url}", flush=True),
+    )
@@ -0,0 +1,35 @@
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    `Image = LazyModule("PIL.Image")` keeps `Image.new(...)` call sites
+    unchanged while moving the import cost from process start to the first
+    use. importlib serialises concurrent first imports, so the proxy can be
+    shared between threads.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def optional_module(name):
+    """LazyModule for `name` if it is installed, else None (checked without importing it)"""
+    try:
+        found = importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        found = False
+    return LazyModule(name) if found else None
@@ -0,0 +1,400 @@
+"""Offline load generator: replays Telegram updates against the real handlers.
+
+Starts the fake Bot API from fake_telegram.py in a child process and points
+the bot's HTTP session at it. It then feeds raw updates through
+bot.process_new_updates at a target rate. The updates follow a configurable
+mix of commands, callbacks and settings flows. Prints throughput, latency
+percentiles and CPU/RSS per action as JSON:
+
+    python loadgen.py --rate 20 --duration 30 --output load.json
+    python loadgen.py --mix "/start=1,auto_front=3,auto_location=5" --record trace.jsonl
+    python loadgen.py --replay trace.jsonl --speed 2
+
+Latency is measured from each update's scheduled send time (open loop).
+Time an update spends queued behind busy workers therefore counts against
+it. Per-action CPU is the handler thread's CPU time. It excludes renders
+offloaded to RENDER_WORKERS processes. Repeat requests for a costly action
+that is still queued or running are coalesced when they are queued, as the
+cluster workers do, and counted per action instead of handled.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+os.environ.setdefault("BOT_TOKEN", "000000:LOADTEST")
+# Measure the handlers rather than the limiter; set RATE_LIMIT_* to include it
+for _limit in ("RATE_LIMIT_USER", "RATE_LIMIT_CHAT", "RATE_LIMIT_GLOBAL"):
+    os.environ.setdefault(_limit, "0")
+# Keep load runs from touching the deployment's databases
+os.environ.setdefault("SETTINGS_BACKEND", "memory")
+os.environ.setdefault("STATE_BACKEND", "memory")
+os.environ.setdefault("STARTUP_WARMUP", "blocking")
+
+import main  # noqa: E402
+import fake_telegram  # noqa: E402
+import memprobe  # noqa: E402
+from cluster import KeyedWorkers, update_user_id  # noqa: E402
+from telebot import types  # noqa: E402
+
+logger = logging.getLogger("loadgen")
+
+# Simulated users get ids from here up, clear of real user and admin ids
+USER_BASE = 10 ** 12
+
+
+# ===== UPDATES =====
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load{user_id}"}
+
+
+class UpdateFactory:
+    """Builds raw update dicts, numbering updates and messages in order"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def _chat_message(self, number, user_id, sender, text):
+        return {"message_id": number, "date": int(time.time()), "chat": {"id": user_id, "type": "private"},
+                "from": sender, "text": text}
+
+    def message(self, user_id, text):
+        number = next(self._ids)
+        message = self._chat_message(number, user_id, _user(user_id), text)
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": number, "message": message}
+
+    def callback(self, user_id, data):
+        number = next(self._ids)
+        return {"update_id": number, "callback_query": {
+            "id": str(number), "from": _user(user_id), "chat_instance": str(user_id), "data": data,
+            "message": self._chat_message(number, user_id, fake_telegram.BOT_USER, "menu"),
+        }}
+
+
+def update_action(update):
+    """Action label of a raw update: callback data, '/command' or 'text'"""
+    if "callback_query" in update:
+        return update["callback_query"].get("data", "callback")
+    text = (update.get("message") or {}).get("text", "")
+    return f"/{main.command_name(text)}" if text.startswith("/") else "text"
+
+
+def build_scenarios():
+    """Scenario name -> fn(factory, user_id) returning [(action label, raw update), ...]"""
+    def command(name):
+        return lambda factory, user_id: [(f"/{name}", factory.message(user_id, f"/{name}"))]
+
+    def callback(name):
+        return lambda factory, user_id: [(name, factory.callback(user_id, name))]
+
+    def setting_input(action):
+        value = str(main.SETTING_LIMITS[action.setting][0])
+        return lambda factory, user_id: [
+            (action.name, factory.callback(user_id, action.name)),
+            (f"input:{action.setting}", factory.message(user_id, value)),
+        ]
+
+    scenarios = {"/start": command("start"), "/help": command("help")}
+    scenarios.update({f"/{name}": command(name) for name in main.AUTO_COMMANDS})
+    scenarios.update({name: callback(name) for name in main.ACTIONS})
+    scenarios.update({
+        f"input:{action.setting}": setting_input(action)
+        for action in main.ACTIONS.values() if action.kind == "prompt" and action.setting
+    })
+    return scenarios
+
+
+def parse_mix(value, scenarios):
+    """'/start=1,auto_front=3' -> {scenario: weight}; 'all' weights every scenario equally"""
+    if not value or value == "all":
+        return {name: 1.0 for name in scenarios}
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in scenarios:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of: {', '.join(scenarios)}")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+# ===== TRACES =====
+def generate(mix, scenarios, rate, duration, users, seed=None, poisson=False):
+    """Trace items {"t", "action", "update"} arriving at `rate` per second for `duration` seconds"""
+    rng = random.Random(seed)
+    factory = UpdateFactory()
+    names, weights = list(mix), list(mix.values())
+    items, t = [], 0.0
+    while t < duration:
+        name = rng.choices(names, weights)[0]
+        user_id = USER_BASE + rng.randrange(users)
+        for action, update in scenarios[name](factory, user_id):
+            items.append({"t": round(t, 6), "action": action, "update": update})
+        t += rng.expovariate(rate) if poisson else 1.0 / rate
+    return items
+
+
+def write_trace(path, items):
+    with open(path, "w") as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+def read_trace(path, rate=None):
+    """Load a trace; bare update lines are labelled and spaced at `rate` (default 10/s)"""
+    items = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            item = entry if "update" in entry else {"update": entry}
+            if item.get("t") is None:
+                item["t"] = len(items) / (rate or 10.0)
+            item.setdefault("action", update_action(item["update"]))
+            items.append(item)
+    return items
+
+
+# ===== RUNNER =====
+class LoadRun:
+    """Runs trace items on keyed worker threads and records per-action timings.
+
+    Updates of one user stay in order on one thread, as in the cluster
+    workers, so multi-step flows (a settings prompt and its reply) work.
+    Costly actions are claimed before they are queued, through the same
+    main.claim_routed_update the cluster workers use.
+    """
+
+    def __init__(self, workers):
+        self.samples = {}
+        self.errors = {}
+        self.coalesced = {}
+        self.finished = None
+        self._lock = threading.Lock()
+        self.handlers = KeyedWorkers(self._handle, workers=workers, max_queue=100000, name="load")
+
+    def _handle(self, job):
+        scheduled, action, raw, key = job
+        start, cpu = time.perf_counter(), time.thread_time()
+        failed = False
+        try:
+            main.bot.process_new_updates([types.Update.de_json(raw)])
+        except Exception as e:
+            failed = True
+            logger.debug(f"Update {raw.get('update_id')} ({action}) failed: {e}")
+        finally:
+            if key is not None:
+                main.queued_actions.release(key)
+        finished = time.perf_counter()
+        cpu = time.thread_time() - cpu
+        with self._lock:
+            self.samples.setdefault(action, []).append((finished - scheduled, finished - start, cpu))
+            if failed:
+                self.errors[action] = self.errors.get(action, 0) + 1
+            self.finished = max(self.finished or finished, finished)
+
+    def replay(self, items, speed=1.0, drain_timeout=300.0):
+        """Send every item at its scheduled offset (divided by `speed`), then wait for the handlers"""
+        started = time.perf_counter()
+        for item in items:
+            due = started + item["t"] / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            admitted, key = main.claim_routed_update(item["update"])
+            if not admitted:
+                with self._lock:
+                    self.coalesced[item["action"]] = self.coalesced.get(item["action"], 0) + 1
+                continue
+            self.handlers.submit(update_user_id(item["update"]), (due, item["action"], item["update"], key))
+        self.handlers.stop(drain_timeout)
+        return started
+
+
+def measure_memory(items):
+    """Peak RSS growth of one update per action, handled alone"""
+    peaks = {}
+    for item in items:
+        action = item["action"]
+        prompt = getattr(main.ACTIONS.get(action), "kind", None) == "prompt"
+        if action in peaks and not prompt:
+            continue
+        update = types.Update.de_json(item["update"])
+        try:
+            with memprobe.PeakRSS() as rss:
+                main.bot.process_new_updates([update])
+            peak = rss.growth
+        except Exception:
+            peak = None
+        peaks.setdefault(action, peak)
+    return peaks
+
+
+# ===== REPORT =====
+def _ms(values):
+    values = sorted(values)
+    pick = lambda q: round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3)
+    return {"p50": pick(0.50), "p99": pick(0.99), "max": round(values[-1] * 1000, 3)}
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def summarize(run, started, cpu_seconds, rss_growth, peaks):
+    everything = [sample for samples in run.samples.values() for sample in samples]
+    completed = len(everything)
+    wall = (run.finished - started) if run.finished else 0.0
+    totals = {
+        "completed": completed,
+        "errors": sum(run.errors.values()),
+        "coalesced": sum(run.coalesced.values()),
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(completed / wall, 2) if wall else 0.0,
+        "latency_ms": _ms([latency for latency, _, _ in everything]) if everything else None,
+        "cpu_s": round(cpu_seconds, 3),
+        "cpu_ms_per_update": round(cpu_seconds * 1000 / completed, 3) if completed else None,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "rss_growth_bytes": rss_growth,
+    }
+    actions = {}
+    for action in sorted(set(run.samples) | set(run.coalesced)):
+        samples = run.samples.get(action)
+        actions[action] = {
+            "count": len(samples or ()),
+            "errors": run.errors.get(action, 0),
+            "coalesced": run.coalesced.get(action, 0),
+            "latency_ms": _ms([latency for latency, _, _ in samples]) if samples else None,
+            "service_ms": _ms([service for _, service, _ in samples]) if samples else None,
+            "cpu_ms_mean": round(sum(cpu for _, _, cpu in samples) * 1000 / len(samples), 3) if samples else None,
+            "peak_rss_growth_bytes": peaks.get(action),
+        }
+    return totals, actions
+
+
+def format_table(totals, actions):
+    lines = [f"{'action':<24}{'count':>7}{'coalesced':>10}{'p50 ms':>10}{'p99 ms':>10}{'cpu ms':>9}{'rss KiB':>10}"]
+    for action, stats in actions.items():
+        latency = stats["latency_ms"] or {"p50": 0.0, "p99": 0.0}
+        peak = stats["peak_rss_growth_bytes"]
+        lines.append(
+            f"{action:<24}{stats['count']:>7}{stats['coalesced']:>10}{latency['p50']:>10.1f}{latency['p99']:>10.1f}"
+            f"{stats['cpu_ms_mean'] or 0.0:>9.1f}{(f'{peak / 1024:.0f}' if peak is not None else '-'):>10}"
+        )
+    latency = totals["latency_ms"] or {"p50": 0.0, "p99": 0.0}
+    lines.append(
+        f"{totals['completed']} updates in {totals['wall_s']}s: {totals['throughput_per_s']}/s, "
+        f"p50 {latency['p50']} ms, p99 {latency['p99']} ms, {totals['errors']} errors, {totals['coalesced']} coalesced"
+    )
+    return "\n".join(lines)
+
+
+# ===== CLI =====
+def start_fake_api(latency):
+    """Serve the fake Bot API from a child process, so its CPU is not charged to the bot"""
+    process = subprocess.Popen(
+        [sys.executable, fake_telegram.__file__, "--port", "0", "--latency", str(latency)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = process.stdout.readline()
+    if "TELEGRAM_API_URL=" not in line:
+        process.terminate()
+        raise RuntimeError(f"Fake Bot API did not start: {line.strip() or 'no output'}")
+    return process, line.strip().split("TELEGRAM_API_URL=", 1)[1]
+
+
+def main_cli(argv=None):
+    scenarios = build_scenarios()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=10.0, help="updates per second (default 10)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of generated traffic")
+    parser.add_argument("--mix", default="all", help="scenario=weight,... (scenarios: " + ", ".join(scenarios) + ")")
+    parser.add_argument("--users", type=int, default=50, help="simulated users the traffic is spread over")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible update mix")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of a fixed rate")
+    parser.add_argument("--workers", type=int, default=main.BOT_WORKERS, help="handler threads")
+    parser.add_argument("--replay", help="replay this trace (JSON lines) instead of generating traffic")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor")
+    parser.add_argument("--record", help="write the trace that is sent to this file")
+    parser.add_argument("--api-url", help="use a running fake Bot API (apihelper.API_URL format)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds the fake API adds per call")
+    parser.add_argument("--no-memory", action="store_true", help="skip the per-action RSS pass")
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        items = read_trace(args.replay, args.rate)
+    else:
+        try:
+            mix = parse_mix(args.mix, scenarios)
+        except ValueError as e:
+            parser.error(str(e))
+        items = generate(mix, scenarios, args.rate, args.duration, args.users, args.seed, args.poisson)
+    if args.record:
+        write_trace(args.record, items)
+
+    fake_process = None
+    api_url = args.api_url
+    if not api_url:
+        fake_process, api_url = start_fake_api(args.api_latency)
+    main.TELEGRAM_API_URL = api_url
+    main.start_services()
+    # Handlers run inline on the load threads instead of the bot's worker pool
+    main.bot.threaded = False
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        run = LoadRun(args.workers)
+        rss_before, cpu_before = memprobe.rss_bytes(), _cpu_seconds()
+        started = run.replay(items, args.speed)
+        cpu_seconds = _cpu_seconds() - cpu_before
+        rss_after = memprobe.rss_bytes()
+        rss_growth = (rss_after - rss_before) if rss_before is not None and rss_after is not None else None
+        peaks = {} if args.no_memory else measure_memory(items)
+    finally:
+        main.stop_services()
+        if fake_process is not None:
+            fake_process.terminate()
+
+    totals, actions = summarize(run, started, cpu_seconds, rss_growth, peaks)
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "workers": args.workers,
+            "updates": len(items),
+            "source": args.replay or f"generated: {args.rate}/s for {args.duration}s, mix {args.mix}",
+            "speed": args.speed,
+            "api_latency_s": args.api_latency,
+            "profile": main.OUTPUT_PROFILE,
+        },
+        "totals": totals,
+        "actions": actions,
+    }
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    print(format_table(totals, actions), file=sys.stderr)
+    return 1 if totals["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,17 +1,48 @@
 import os
+import startup
+# STARTUP_PROFILE=1 times every import below for the startup report. It is read
+# from the process environment: .env is only loaded after the imports.
+if os.getenv("STARTUP_PROFILE") == "1":
+    startup.timer.profile_imports()
 import logging
 from datetime import datetime
 from pathlib import Path
 import random
 import string
+import threading
+import functools
+import asyncio
+import time
+import multiprocessing
+import signal
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv
 import telebot
-from telebot import types
+from telebot import types, apihelper
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 import json
-import requests
-from PIL import Image, ImageDraw, ImageFont
 import io
+from dataclasses import dataclass, field
+from notifier import AdminNotifier
+from webhook import WebhookServer, configure_http_pool
+from render_cache import ByteLRUCache, BackendByteCache
+from settings_store import SettingsStore
+from ratelimit import RateLimiter, parse_limit
+from singleflight import SingleFlight
+import textures
+from uploads import BufferPool, stream_uploads
+from workers import BoundedWorkerPool
+from content import ContentPool, location_batch, contact_batch, device_batch
+from state import open_backend
+from cluster import WorkerCluster, KeyedWorkers, update_user_id
+from lazy import LazyModule
+import metrics
+
+# Pillow loads on the first render, which the startup warmup triggers in the background
+Image = LazyModule("PIL.Image")
+ImageDraw = LazyModule("PIL.ImageDraw")
+ImageFont = LazyModule("PIL.ImageFont")
+startup.timer.mark("imports")
 
 # Load environment variables
 load_dotenv()
@@ -20,9 +51,98 @@ load_dotenv()
 TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_IDS = json.loads(os.getenv("ADMIN_IDS", "[7221952061]"))
 BOT_USERNAME = os.getenv("BOT_USERNAME", "your_bot_username")
+ADMIN_QUEUE_SIZE = int(os.getenv("ADMIN_QUEUE_SIZE", "1000"))
+ADMIN_DIGEST_INTERVAL = float(os.getenv("ADMIN_DIGEST_INTERVAL", "2"))
+BOT_RUNTIME = os.getenv("BOT_RUNTIME", "threaded")
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "8"))
+BOT_QUEUE_SIZE = int(os.getenv("BOT_QUEUE_SIZE", "100"))
+POLLING_TIMEOUT = int(os.getenv("POLLING_TIMEOUT", "60"))
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "30"))
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+RENDER_WORKERS = os.getenv("RENDER_WORKERS", "0")
+# Threads rendering concurrently when RENDER_WORKERS=0; "auto" is 2-4 by CPU count
+RENDER_THREADS = os.getenv("RENDER_THREADS", "auto")
+RENDER_START_METHOD = os.getenv("RENDER_START_METHOD", "spawn")
+RENDER_DETERMINISTIC = os.getenv("RENDER_DETERMINISTIC", "0") == "1"
+RENDER_SEED = os.getenv("RENDER_SEED", "0")
+RENDER_TIME_BUCKET = int(os.getenv("RENDER_TIME_BUCKET", "60"))
+OUTPUT_PROFILE = os.getenv("OUTPUT_PROFILE", "full")
+RENDER_CACHE_BYTES = int(os.getenv("RENDER_CACHE_BYTES", str(64 * 1024 * 1024)))
+CONTENT_SEED = os.getenv("CONTENT_SEED")
+CONTENT_BATCH_SIZE = int(os.getenv("CONTENT_BATCH_SIZE", "512"))
+SETTINGS_BACKEND = os.getenv("SETTINGS_BACKEND", "sqlite")
+SETTINGS_DB = os.getenv("SETTINGS_DB", "data/settings.db")
+WORKER_PROCESSES = os.getenv("WORKER_PROCESSES", "1")
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+# memory | sqlite; defaults to sqlite when several worker processes must share it
+STATE_BACKEND = os.getenv("STATE_BACKEND")
+STATE_DB = os.getenv("STATE_DB", "data/state.db")
+SHARED_CACHE_ENTRIES = int(os.getenv("SHARED_CACHE_ENTRIES", "256"))
+SETTINGS_FLUSH_INTERVAL = float(os.getenv("SETTINGS_FLUSH_INTERVAL", "1"))
+SETTINGS_CACHE_SIZE = int(os.getenv("SETTINGS_CACHE_SIZE", "10000"))
+# Seconds a settings prompt waits for the user's typed value
+PENDING_INPUT_TTL = float(os.getenv("PENDING_INPUT_TTL", "300"))
+# Token buckets as "tokens per second:burst"; one token is one rendered photo or reply.
+# The global default stays under Telegram's ~30 messages/second bot-wide limit.
+RATE_LIMIT_USER = os.getenv("RATE_LIMIT_USER", "0.5:10")
+RATE_LIMIT_CHAT = os.getenv("RATE_LIMIT_CHAT", "1:20")
+RATE_LIMIT_GLOBAL = os.getenv("RATE_LIMIT_GLOBAL", "25:30")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH")
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "60"))
+BACKGROUND_VARIANTS = max(1, int(os.getenv("BACKGROUND_VARIANTS", "3")))
+# Amplitude of per-pixel grain on the textured backgrounds; off by default, as
+# grain does not compress: 5.0 grows a full-profile JPEG from ~110 to ~730 KB
+BACKGROUND_GRAIN = float(os.getenv("BACKGROUND_GRAIN", "0"))
+FONT_FAMILY = os.getenv("FONT_FAMILY", "arial.ttf")
+FONT_PATH = [p for p in os.getenv("FONT_PATH", "").split(os.pathsep) if p]
+# background: warm caches after startup, while the first updates are fetched;
+# blocking: warm them before taking updates; off: fill them on first use
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
 
 # Initialize bot
-bot = telebot.TeleBot(TOKEN)
+# Handlers run on the bounded pool installed under HANDLER WORKER POOL
+bot = telebot.TeleBot(TOKEN, threaded=False)
+bot.process_new_updates = startup.timer.watch_updates(bot.process_new_updates)
+
+# Admin notifications are delivered by a background dispatcher
+admin_notifier = AdminNotifier(bot, ADMIN_IDS, max_queue=ADMIN_QUEUE_SIZE, digest_interval=ADMIN_DIGEST_INTERVAL)
+
+def resolve_worker_processes(value=None):
+    """Turn a WORKER_PROCESSES setting into a process count"""
+    value = str(WORKER_PROCESSES if value is None else value).strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(int(value), 1)
+
+# State that every worker process has to agree on (rate limits, rendered-image
+# cache) goes through this backend; a single process keeps it in memory
+STATE_BACKEND_KIND = STATE_BACKEND or ("sqlite" if resolve_worker_processes() > 1 else "memory")
+shared_state = open_backend(STATE_BACKEND_KIND, STATE_DB)
+
+# Per-user settings, served from memory and flushed to the settings backend in batches
+DEFAULT_SETTINGS = {"photo_count": 1, "delay": 1, "send_admin": True}
+SETTING_LIMITS = {"photo_count": (1, 10), "delay": (1, 60)}
+settings_backend = open_backend(SETTINGS_BACKEND, SETTINGS_DB)
+settings_store = SettingsStore(
+    settings_backend, DEFAULT_SETTINGS, flush_interval=SETTINGS_FLUSH_INTERVAL, max_cached=SETTINGS_CACHE_SIZE
+)
+
+# Export dispatcher state alongside the handler metrics
+metrics.registry.register_collector(
+    "bot_admin_notifications", "Admin notification dispatcher counters", admin_notifier.stats,
+    counters=("queued", "sent", "dropped", "retried", "failed"),
+)
+metrics.registry.register_collector("bot_startup_seconds", "Seconds from process start to each startup milestone", startup.timer.stats)
 
 # Setup logging
 logging.basicConfig(
@@ -31,74 +151,95 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Create necessary directories
-Path("photos").mkdir(exist_ok=True)
-Path("data").mkdir(exist_ok=True)
+# ===== FONT REGISTRY =====
+# Fonts are resolved and parsed once per (family, size) and kept for the life
+# of the process. A missing family falls back to Pillow's default font and the
+# fallback is logged only the first time it happens.
+_font_cache = {}
+_font_lock = threading.Lock()
+_font_fallbacks = set()
 
-# ===== PHOTO GENERATION FUNCTIONS =====
-def generate_front_camera_photo(user_info=None):
-    """Generate a simulated front camera photo"""
-    # Create a new image
-    img = Image.new('RGB', (1080, 1920), color=(40, 44, 52))
+def _resolve_font_path(family):
+    """Find a font file in FONT_PATH, falling back to Pillow's own lookup"""
+    for directory in FONT_PATH:
+        candidate = Path(directory) / family
+        if candidate.is_file():
+            return str(candidate)
+    return family
+
+def get_font(size, family=None):
+    """Return the shared font object for a family and size"""
+    family = family or FONT_FAMILY
+    key = (family, size)
+    font = _font_cache.get(key)
+    if font is None:
+        with _font_lock:
+            font = _font_cache.get(key)
+            if font is None:
+                try:
+                    font = ImageFont.truetype(_resolve_font_path(family), size)
+                except OSError:
+                    if family not in _font_fallbacks:
+                        _font_fallbacks.add(family)
+                        logger.warning(f"Font {family} not found, using Pillow default font")
+                    font = ImageFont.load_default()
+                _font_cache[key] = font
+    return font
+
+# ===== BACKGROUND LAYER CACHE =====
+# The camera chrome (status bars, grids, frames, effects) never changes between
+# calls, so each photo type's background is rendered once and every photo is
+# composited onto a copy of it. Only the dynamic overlay is drawn per call.
+# With NumPy installed the scene under the chrome is a procedural texture
+# (gradient, blotches, vignette, optional BACKGROUND_GRAIN grain);
+# BACKGROUND_VARIANTS differently seeded versions are cached and each photo
+# picks one. The smooth texture stays cheap to encode (about 110 KB per
+# full-profile photo against 60-80 KB for a flat fill).
+_background_cache = {}
+_background_lock = threading.Lock()
+
+# Gradient colours and texture strengths of each photo type's scene
+BACKGROUND_SCENES = {
+    "front": dict(top=(34, 38, 48), bottom=(78, 84, 100), vignette_strength=0.45),
+    "back": dict(top=(92, 128, 178), bottom=(70, 86, 64), vignette_strength=0.3, blotch=0.35),
+    "selfie": dict(top=(58, 46, 60), bottom=(120, 92, 82), vignette_strength=0.5),
+}
+
+def scene_canvas(photo_type, size, color, variant=0):
+    """Textured scene for a photo type, or a flat `color` fill without NumPy"""
+    if textures.available():
+        return textures.scene(size, seed=variant, noise=BACKGROUND_GRAIN, **BACKGROUND_SCENES[photo_type])
+    return Image.new('RGB', size, color=color)
+
+def render_front_background(variant=0):
+    """Render the static layer of the front camera photo"""
+    img = scene_canvas("front", (1080, 1920), (40, 44, 52), variant)
     draw = ImageDraw.Draw(img)
-    
-    # Try to load a font, use default if not available
-    try:
-        font = ImageFont.truetype("arial.ttf", 60)
-        small_font = ImageFont.truetype("arial.ttf", 40)
-    except:
-        font = ImageFont.load_default()
-        small_font = ImageFont.load_default()
-    
-    # Draw camera UI elements
+
+    font = get_font(60)
+
     # Top status bar
     draw.rectangle([0, 0, 1080, 100], fill=(20, 24, 32))
     draw.text((50, 20), "📱 Front Camera", font=font, fill=(255, 255, 255))
     draw.text((850, 20), "12:00", font=font, fill=(255, 255, 255))
-    
-    # Camera preview
-    draw.rectangle([40, 150, 1040, 1770], fill=(60, 64, 72), outline=(100, 200, 255), width=5)
-    
-    # Add some random "face detection" boxes
-    for _ in range(3):
-        x = random.randint(100, 900)
-        y = random.randint(300, 1400)
-        draw.rectangle([x, y, x+200, y+200], outline=(0, 255, 100), width=3)
-        draw.text((x+10, y+10), "👤", font=font)
-    
-    # Add user info if provided
-    if user_info:
-        info_y = 1800
-        info_text = f"User: {user_info}"
-        draw.text((50, info_y), info_text, font=small_font, fill=(200, 200, 255))
-    
-    # Add timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    draw.text((50, 1850), f"📅 {timestamp}", font=small_font, fill=(200, 200, 200))
-    
-    # Save to bytes
-    img_bytes = io.BytesIO()
-    img.save(img_bytes, format='JPEG', quality=95)
-    img_bytes.seek(0)
-    
-    return img_bytes
 
-def generate_back_camera_photo(user_info=None):
-    """Generate a simulated back camera photo"""
-    img = Image.new('RGB', (1920, 1080), color=(50, 54, 62))
+    # Camera preview (flat without NumPy, otherwise the scene shows through)
+    preview_fill = None if textures.available() else (60, 64, 72)
+    draw.rectangle([40, 150, 1040, 1770], fill=preview_fill, outline=(100, 200, 255), width=5)
+
+    return img
+
+def render_back_background(variant=0):
+    """Render the static layer of the back camera photo"""
+    img = scene_canvas("back", (1920, 1080), (50, 54, 62), variant)
     draw = ImageDraw.Draw(img)
-    
-    try:
-        font = ImageFont.truetype("arial.ttf", 60)
-        small_font = ImageFont.truetype("arial.ttf", 30)
-    except:
-        font = ImageFont.load_default()
-        small_font = ImageFont.load_default()
-    
+
+    font = get_font(60)
+
     # Camera UI
     draw.rectangle([0, 0, 1920, 80], fill=(25, 29, 37))
     draw.text((50, 10), "📷 Back Camera", font=font, fill=(255, 255, 255))
-    
+
     # Grid lines (simulating camera grid)
     for i in range(1, 4):
         x = i * 480
@@ -106,81 +247,402 @@ def generate_back_camera_photo(user_info=None):
     for i in range(1, 3):
         y = 100 + i * 300
         draw.line([(50, y), (1870, y)], fill=(100, 100, 100, 100), width=2)
-    
+
     # Add some objects
     objects = ["🏢 Building", "🌳 Tree", "🚗 Car", "👥 People", "☁️ Sky"]
     for i, obj in enumerate(objects):
         x = 100 + i * 350
         y = 400
         draw.text((x, y), obj, font=font, fill=(255, 255, 200))
-    
+
     # Add focus point
     draw.ellipse([900, 400, 1020, 520], outline=(0, 255, 0), width=4)
     draw.text((930, 450), "⚫", font=font)
-    
-    if user_info:
-        draw.text((50, 1020), f"📸 By: {user_info}", font=small_font, fill=(200, 200, 255))
-    
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    draw.text((1500, 1020), f"🕒 {timestamp}", font=small_font, fill=(200, 200, 200))
-    
-    img_bytes = io.BytesIO()
-    img.save(img_bytes, format='JPEG', quality=95)
-    img_bytes.seek(0)
-    
-    return img_bytes
 
-def generate_selfie_photo(user_info=None):
-    """Generate a simulated selfie photo"""
-    img = Image.new('RGB', (1080, 1920), color=(45, 49, 57))
+    return img
+
+def render_selfie_background(variant=0):
+    """Render the static layer of the selfie photo"""
+    img = scene_canvas("selfie", (1080, 1920), (45, 49, 57), variant)
     draw = ImageDraw.Draw(img)
-    
-    try:
-        font = ImageFont.truetype("arial.ttf", 70)
-        small_font = ImageFont.truetype("arial.ttf", 40)
-    except:
-        font = ImageFont.load_default()
-        small_font = ImageFont.load_default()
-    
+
+    font = get_font(70)
+    small_font = get_font(40)
+
     # Selfie-specific elements
     draw.rectangle([0, 0, 1080, 120], fill=(30, 34, 42))
     draw.text((50, 20), "🤳 SELFIE MODE", font=font, fill=(255, 200, 100))
-    
+
     # Mirror-like effect
     draw.ellipse([340, 300, 740, 700], outline=(100, 200, 255), width=8)
     draw.text((480, 450), "👤", font=font)
-    
+
     # Add some effects
     effects = ["✨", "🌟", "💫", "❤️", "🔥"]
     for i, effect in enumerate(effects):
         x = 100 + i * 180
         y = 800
         draw.text((x, y), effect, font=font)
-    
-    # User info
-    if user_info:
-        draw.text((50, 1700), f"User: {user_info}", font=small_font, fill=(255, 200, 100))
-    
+
     # Camera info
     camera_info = "f/2.2 • 1/30s • ISO 400"
     draw.text((50, 1800), f"📷 {camera_info}", font=small_font, fill=(200, 200, 200))
-    
-    img_bytes = io.BytesIO()
-    img.save(img_bytes, format='JPEG', quality=95)
+
+    return img
+
+BACKGROUND_RENDERERS = {
+    "front": render_front_background,
+    "back": render_back_background,
+    "selfie": render_selfie_background,
+}
+
+def background_variants():
+    # Flat fills do not depend on the seed, so one variant is enough without NumPy
+    return BACKGROUND_VARIANTS if textures.available() else 1
+
+def get_background(photo_type, variant=0):
+    """Return a private copy of the cached static background for a photo type"""
+    key = (photo_type, variant % background_variants())
+    background = _background_cache.get(key)
+    if background is None:
+        with _background_lock:
+            background = _background_cache.get(key)
+            if background is None:
+                background = BACKGROUND_RENDERERS[photo_type](key[1])
+                _background_cache[key] = background
+    return background.copy()
+
+def pick_background(photo_type, rng):
+    return get_background(photo_type, rng.randrange(background_variants()))
+
+def warm_background_cache():
+    """Render every static background up front so the first photo is not slower"""
+    for photo_type in BACKGROUND_RENDERERS:
+        for variant in range(background_variants()):
+            get_background(photo_type, variant)
+    textured = "textured" if textures.available() else "flat, NumPy not installed"
+    logger.info(f"Background cache warmed: {len(_background_cache)} backgrounds ({textured})")
+
+# ===== OUTPUT PROFILES =====
+# A profile decides the delivered size, format and encoder settings of each
+# photo type. "full" matches the original 1080p JPEG q95 output; the smaller
+# profiles trade some fidelity for much smaller uploads and faster encodes,
+# since Telegram recompresses photos anyway. OUTPUT_PROFILE picks the
+# deployment default and generate_random_photo(profile=...) overrides it.
+NATIVE_SIZES = {
+    "front": (1080, 1920),
+    "back": (1920, 1080),
+    "selfie": (1080, 1920),
+}
+
+def _scaled_sizes(scale):
+    return {photo_type: (round(w * scale), round(h * scale)) for photo_type, (w, h) in NATIVE_SIZES.items()}
+
+@dataclass(frozen=True)
+class OutputProfile:
+    format: str = "JPEG"
+    quality: int = 95
+    progressive: bool = False
+    optimize: bool = False
+    subsampling: int = -1
+    sizes: dict = field(default_factory=dict)
+
+    def encoder_options(self):
+        if self.format == "WEBP":
+            return {"quality": self.quality, "method": 0}
+        options = {"quality": self.quality, "progressive": self.progressive, "optimize": self.optimize}
+        if self.subsampling >= 0:
+            options["subsampling"] = self.subsampling
+        return options
+
+OUTPUT_PROFILES = {
+    "full": OutputProfile(),
+    "balanced": OutputProfile(quality=85, subsampling=2),
+    "compact": OutputProfile(quality=75, subsampling=2, sizes=_scaled_sizes(0.5)),
+    "webp": OutputProfile(format="WEBP", quality=75, sizes=_scaled_sizes(0.5)),
+}
+
+def get_output_profile(profile=None):
+    """Resolve a profile name (or None for the deployment default) to an OutputProfile"""
+    if isinstance(profile, OutputProfile):
+        return profile
+    name = profile or OUTPUT_PROFILE
+    if name not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile: {name}")
+    return OUTPUT_PROFILES[name]
+
+def encode_image(img, photo_type, profile=None, out=None):
+    """Resize and encode a rendered photo according to an output profile, into `out` or a new BytesIO"""
+    profile = get_output_profile(profile)
+    size = profile.sizes.get(photo_type)
+    if size and size != img.size:
+        factor = img.width // size[0]
+        if factor > 1 and img.size == (size[0] * factor, size[1] * factor):
+            # Integer downscales use the much cheaper box reduction
+            img = img.reduce(factor)
+        else:
+            img = img.resize(size, Image.BOX)
+
+    img_bytes = out if out is not None else io.BytesIO()
+    img.save(img_bytes, format=profile.format, **profile.encoder_options())
     img_bytes.seek(0)
-    
+
     return img_bytes
 
-def generate_random_photo(photo_type="front", user_info=None):
+# ===== PHOTO GENERATION FUNCTIONS =====
+def render_front_camera_image(user_info=None, rng=None, now=None):
+    """Draw a simulated front camera photo without encoding it"""
+    rng = rng or random
+    now = now or datetime.now()
+    img = pick_background("front", rng)
+    draw = ImageDraw.Draw(img)
+
+    font = get_font(60)
+    small_font = get_font(40)
+
+    # Add some random "face detection" boxes
+    for _ in range(3):
+        x = rng.randint(100, 900)
+        y = rng.randint(300, 1400)
+        draw.rectangle([x, y, x+200, y+200], outline=(0, 255, 100), width=3)
+        draw.text((x+10, y+10), "👤", font=font)
+
+    # Add user info if provided
+    if user_info:
+        info_y = 1800
+        info_text = f"User: {user_info}"
+        draw.text((50, info_y), info_text, font=small_font, fill=(200, 200, 255))
+
+    # Add timestamp
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    draw.text((50, 1850), f"📅 {timestamp}", font=small_font, fill=(200, 200, 200))
+
+    return img
+
+def generate_front_camera_photo(user_info=None, rng=None, now=None, profile=None):
+    """Generate a simulated front camera photo"""
+    return encode_image(render_front_camera_image(user_info, rng, now), "front", profile)
+
+def render_back_camera_image(user_info=None, rng=None, now=None):
+    """Draw a simulated back camera photo without encoding it"""
+    rng = rng or random
+    now = now or datetime.now()
+    img = pick_background("back", rng)
+    draw = ImageDraw.Draw(img)
+
+    small_font = get_font(30)
+
+    if user_info:
+        draw.text((50, 1020), f"📸 By: {user_info}", font=small_font, fill=(200, 200, 255))
+
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    draw.text((1500, 1020), f"🕒 {timestamp}", font=small_font, fill=(200, 200, 200))
+
+    return img
+
+def generate_back_camera_photo(user_info=None, rng=None, now=None, profile=None):
+    """Generate a simulated back camera photo"""
+    return encode_image(render_back_camera_image(user_info, rng, now), "back", profile)
+
+def render_selfie_image(user_info=None, rng=None, now=None):
+    """Draw a simulated selfie photo without encoding it"""
+    rng = rng or random
+    img = pick_background("selfie", rng)
+    draw = ImageDraw.Draw(img)
+
+    small_font = get_font(40)
+
+    # User info
+    if user_info:
+        draw.text((50, 1700), f"User: {user_info}", font=small_font, fill=(255, 200, 100))
+
+    return img
+
+def generate_selfie_photo(user_info=None, rng=None, now=None, profile=None):
+    """Generate a simulated selfie photo"""
+    return encode_image(render_selfie_image(user_info, rng, now), "selfie", profile)
+
+PHOTO_RENDERERS = {
+    "front": render_front_camera_image,
+    "back": render_back_camera_image,
+    "selfie": render_selfie_image,
+}
+
+def generate_random_photo(photo_type="front", user_info=None, rng=None, now=None, profile=None):
     """Generate random photo based on type"""
     if photo_type == "front":
-        return generate_front_camera_photo(user_info)
+        return generate_front_camera_photo(user_info, rng, now, profile)
     elif photo_type == "back":
-        return generate_back_camera_photo(user_info)
+        return generate_back_camera_photo(user_info, rng, now, profile)
     elif photo_type == "selfie":
-        return generate_selfie_photo(user_info)
+        return generate_selfie_photo(user_info, rng, now, profile)
     else:
-        return generate_front_camera_photo(user_info)
+        return generate_front_camera_photo(user_info, rng, now, profile)
+
+# ===== DETERMINISTIC RENDERING =====
+# With RENDER_DETERMINISTIC=1 a (photo_type, user_info, seed, time bucket,
+# profile, index) key fully determines the image: the face boxes come from an
+# RNG seeded by the key and the timestamp is the start of the
+# RENDER_TIME_BUCKET-second bucket. That makes encoded photos reusable, so they
+# are kept in a byte-bounded LRU cache. `index` numbers the photos of one
+# multi-photo send; it seeds the RNG and offsets the timestamp by that many
+# seconds, so an album holds different photos rather than N copies.
+if STATE_BACKEND_KIND == "memory":
+    render_cache = ByteLRUCache(RENDER_CACHE_BYTES)
+else:
+    render_cache = BackendByteCache(shared_state, max_entries=SHARED_CACHE_ENTRIES)
+metrics.registry.register_collector(
+    "bot_render_cache", "Rendered image cache counters", render_cache.stats, counters=("hits", "misses", "evictions")
+)
+
+def render_key(photo_type, user_info=None, profile=None, index=0):
+    """Return the cache key for a render, or None when rendering is random"""
+    if not RENDER_DETERMINISTIC:
+        return None
+    bucket = int(time.time() // RENDER_TIME_BUCKET)
+    if isinstance(profile, OutputProfile):
+        profile = repr(profile)
+    return (photo_type, user_info, RENDER_SEED, bucket, profile or OUTPUT_PROFILE, index)
+
+# ===== RENDERING POOL =====
+# Pillow rendering and JPEG encoding are CPU-bound, so handlers submit them to
+# a process pool instead of running them under the GIL in the handler thread.
+# RENDER_WORKERS=0 renders in-process, "auto" sizes the pool to the CPU count.
+# In-process renders submitted together (the auto_all album, multi-photo
+# sends) run on a small thread pool instead: Pillow releases the GIL for most
+# drawing, resizing and JPEG encoding, so they still overlap.
+_render_executor = None
+_render_threads = None
+_render_executor_lock = threading.Lock()
+
+# Reusable encode buffers. Inline renders are encoded into one and uploaded
+# straight from it (see uploads.stream_uploads); pooled renders copy out once.
+upload_buffers = BufferPool()
+metrics.registry.register_collector(
+    "bot_upload_buffers", "Pooled encode/upload buffer counters", upload_buffers.stats,
+    counters=("acquired", "reused", "allocated", "discarded"),
+)
+
+def resolve_render_workers(value=None):
+    """Turn a RENDER_WORKERS setting into a worker count"""
+    value = str(RENDER_WORKERS if value is None else value).strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(int(value), 0)
+
+def render_photo_into(out, photo_type="front", user_info=None, key=None, profile=None):
+    """Render and encode a photo into `out`, returning (render seconds, encode seconds)"""
+    rng = now = None
+    if key is not None:
+        rng = random.Random("|".join(str(part) for part in key))
+        # Photos of one send are stamped a second apart, like a burst
+        now = datetime.fromtimestamp(key[3] * RENDER_TIME_BUCKET + key[5])
+    renderer = PHOTO_RENDERERS.get(photo_type, render_front_camera_image)
+
+    start = time.perf_counter()
+    img = renderer(user_info, rng, now)
+    rendered = time.perf_counter()
+    encode_image(img, photo_type, profile, out=out)
+    return rendered - start, time.perf_counter() - rendered
+
+def render_photo_timed(photo_type="front", user_info=None, key=None, profile=None):
+    """Render and encode a photo, returning (encoded bytes, render seconds, encode seconds)"""
+    with upload_buffers.acquire() as buffer:
+        render_seconds, encode_seconds = render_photo_into(buffer, photo_type, user_info, key, profile)
+        return buffer.getvalue(), render_seconds, encode_seconds
+
+def render_photo_bytes(photo_type="front", user_info=None, key=None, profile=None):
+    """Render and encode a photo in the current process, returning the encoded bytes"""
+    return render_photo_timed(photo_type, user_info, key, profile)[0]
+
+def resolve_render_threads(value=None):
+    """Turn a RENDER_THREADS setting into a thread count"""
+    value = str(RENDER_THREADS if value is None else value).strip().lower()
+    if value == "auto":
+        return max(2, min(4, os.cpu_count() or 1))
+    return max(int(value), 1)
+
+def get_render_threads():
+    """Return the in-process rendering thread pool, creating it on first use"""
+    global _render_threads
+    if _render_threads is None:
+        with _render_executor_lock:
+            if _render_threads is None:
+                _render_threads = ThreadPoolExecutor(max_workers=resolve_render_threads(), thread_name_prefix="render")
+    return _render_threads
+
+def get_render_executor():
+    """Return the shared rendering pool, creating it on first use"""
+    global _render_executor
+    workers = resolve_render_workers()
+    if workers == 0:
+        return None
+    if _render_executor is None:
+        with _render_executor_lock:
+            if _render_executor is None:
+                _render_executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context(RENDER_START_METHOD),
+                    initializer=warm_background_cache,
+                )
+                logger.info(f"Rendering pool started with {workers} workers")
+    return _render_executor
+
+def _finish_render(job, future, key, labels):
+    """Record a finished render job and resolve the caller's future with its bytes"""
+    try:
+        data, render_seconds, encode_seconds = job.result()
+    except Exception as e:
+        future.set_exception(e)
+        return
+    metrics.observe_phase("render", render_seconds, labels)
+    metrics.observe_phase("encode", encode_seconds, labels)
+    if key is not None:
+        render_cache.put(key, data)
+    future.set_result(data)
+
+def submit_render(photo_type="front", user_info=None, profile=None, index=0):
+    """Submit a photo for rendering and return a future for its encoded bytes"""
+    key = render_key(photo_type, user_info, profile, index)
+    future = Future()
+    cached = render_cache.get(key) if key is not None else None
+    if cached is not None:
+        future.set_result(cached)
+        return future
+
+    # Render timings are attributed to the handler that asked for the photo
+    labels = metrics.current_labels()
+    executor = get_render_executor() or get_render_threads()
+    job = executor.submit(render_photo_timed, photo_type, user_info, key, profile)
+    job.add_done_callback(lambda job: _finish_render(job, future, key, labels))
+    return future
+
+def render_photo(photo_type="front", user_info=None, profile=None):
+    """Render a photo for upload; close the returned buffer once it has been sent"""
+    if render_key(photo_type, user_info, profile) is not None or get_render_executor() is not None:
+        return io.BytesIO(submit_render(photo_type, user_info, profile).result())
+
+    # Nothing to cache or move between processes: encode straight into a pooled upload buffer
+    buffer = upload_buffers.acquire()
+    try:
+        render_seconds, encode_seconds = render_photo_into(buffer, photo_type, user_info, None, profile)
+    except Exception:
+        buffer.close()
+        raise
+    metrics.observe_phase("render", render_seconds)
+    metrics.observe_phase("encode", encode_seconds)
+    buffer.seek(0)
+    return buffer
+
+def shutdown_render_executor():
+    global _render_executor, _render_threads
+    with _render_executor_lock:
+        if _render_executor is not None:
+            _render_executor.shutdown(wait=True)
+            _render_executor = None
+        if _render_threads is not None:
+            _render_threads.shutdown(wait=True)
+            _render_threads = None
 
 # ===== KEYBOARDS =====
 def main_menu():
@@ -211,410 +673,1162 @@ def settings_menu():
     )
     return keyboard
 
+# Serialized reply_markup payloads per keyboard builder. Telegram accepts the
+# JSON string as-is, so each keyboard is built and serialized once and only
+# rebuilt when ADMIN_IDS (which changes main_menu) has changed.
+_keyboard_payloads = {}
+
+def keyboard_payload(builder):
+    admin_ids = tuple(ADMIN_IDS)
+    cached = _keyboard_payloads.get(builder)
+    if cached is None or cached[0] != admin_ids:
+        cached = _keyboard_payloads[builder] = (admin_ids, builder().to_json())
+    return cached[1]
+
+def warm_keyboard_cache():
+    for builder in (main_menu, settings_menu):
+        keyboard_payload(builder)
+
+# ===== MESSAGE BUILDERS =====
+# Shared by the threaded and the asyncio handler layers.
+def format_user_info(user):
+    return f"{user.first_name} (@{user.username})" if user.username else user.first_name
+
+# Only the first name varies, so the rest of the welcome text is a fixed prefix and suffix
+WELCOME_TEXT_HEAD = "🤖 *Auto Bot Activated!*\n\n👋 Welcome *"
+WELCOME_TEXT_TAIL = (
+    "*\n\n"
+    "🚀 *AUTO FEATURES:*\n"
+    "• 📱 Auto Front Camera Photos\n"
+    "• 📷 Auto Back Camera Photos\n"
+    "• 🤳 Auto Selfie Photos\n"
+    "• 🔄 Auto All Photos (Sequence)\n"
+    "• 📍 Auto Location Share\n"
+    "• 📞 Auto Contact Share\n"
+    "• 📊 Auto Device Info\n\n"
+    "⚡ *Click any button for automatic action!*\n"
+    "No manual uploads needed!"
+)
+
+def build_welcome_text(user):
+    return WELCOME_TEXT_HEAD + user.first_name + WELCOME_TEXT_TAIL
+
+WELCOME_PHOTO_CAPTION = "📸 *Auto Welcome Photo Generated!*\nFront camera simulation"
+
+AUTO_ALL_PHOTOS = [
+    ("front", "📱 Front Camera"),
+    ("back", "📷 Back Camera"),
+    ("selfie", "🤳 Selfie")
+]
+
+def build_admin_photo_caption(label, user):
+    return f"{label}\n👤 From: {format_user_info(user)}\n🆔 ID: {user.id}"
+
+def build_auto_all_media(photos):
+    """Wrap the rendered auto_all photos as an album; the first carries the completion notice"""
+    media = []
+    for i, ((_, caption), photo) in enumerate(zip(AUTO_ALL_PHOTOS, photos)):
+        header = "✅ *Auto Sequence Complete!*\nAll photos generated automatically!\n\n" if i == 0 else ""
+        media.append(types.InputMediaPhoto(
+            io.BytesIO(photo),
+            caption=f"{header}*{caption}*\nAuto-generated sequence",
+            parse_mode="Markdown"
+        ))
+    return media
+
+def build_auto_all_summary(user):
+    return (
+        f"🔄 Auto All Photos Completed\n"
+        f"👤 User: {format_user_info(user)}\n"
+        f"🆔 ID: {user.id}\n"
+        f"📊 Generated: 3 photos\n"
+        f"🕒 Time: {datetime.now().strftime('%H:%M:%S')}"
+    )
+
+# The simulated location/contact/device values come from pre-generated
+# pools (see content.py) and are dropped into templates compiled once here.
+# CONTENT_SEED makes the sequence of generated values reproducible; a seed
+# that is not a non-negative integer is hashed to one.
+location_pool = ContentPool("location", location_batch, CONTENT_BATCH_SIZE, seed=CONTENT_SEED, stream=0)
+contact_pool = ContentPool("contact", contact_batch, CONTENT_BATCH_SIZE, seed=CONTENT_SEED, stream=1)
+device_pool = ContentPool("device", device_batch, CONTENT_BATCH_SIZE, seed=CONTENT_SEED, stream=2)
+CONTENT_POOLS = [location_pool, contact_pool, device_pool]
+metrics.registry.register_collector(
+    "bot_content_pool_available", "Pre-generated items left per content pool",
+    lambda: {pool.name: len(pool) for pool in CONTENT_POOLS}
+)
+
+def warm_content_pools():
+    for pool in CONTENT_POOLS:
+        if not len(pool):
+            pool.fill()
+
+LOCATION_TEMPLATE = (
+    "📍 *Auto Location Generated!*\n\n"
+    "🌍 *Coordinates:*\n"
+    "• Latitude: `{0}`\n"
+    "• Longitude: `{1}`\n\n"
+    "🗺️ [Open in Google Maps](https://maps.google.com/?q={0},{1})\n\n"
+    "🕒 Time: {2}"
+).format
+
+CONTACT_TEMPLATE = (
+    "📞 *Auto Contact Information*\n\n"
+    "👤 *Name:* {0}\n"
+    "📱 *Phone:* `{1}`\n"
+    "📧 *Email:* `{2}`\n"
+    "🆔 *User ID:* `{3}`\n\n"
+    "⚠️ *Note:* This is simulated data"
+).format
+
+DEVICE_TEMPLATE = (
+    "📱 *Auto Device Information*\n\n"
+    "📲 *Device:* {0}\n"
+    "⚙️ *OS:* {1}\n"
+    "🔋 *Battery:* {2}%\n"
+    "📶 *Signal:* {3}/5 bars\n"
+    "💾 *Storage:* {4}GB\n\n"
+    "👤 *User:* {5}\n"
+    "🆔 *Telegram ID:* `{6}`\n\n"
+    "⚠️ *Simulated data for demo*"
+).format
+
+def build_location_text():
+    lat, lon = location_pool.take()
+    return LOCATION_TEMPLATE(lat, lon, datetime.now().strftime('%H:%M:%S'))
+
+def build_contact_text(user):
+    phone_number, email = contact_pool.take()
+    return CONTACT_TEMPLATE(user.first_name, phone_number, email, user.id)
+
+def build_device_text(user):
+    return DEVICE_TEMPLATE(*device_pool.take(), format_user_info(user), user.id)
+
+SETTINGS_TEXT_HEAD = "⚙️ *Auto Bot Settings*\nConfigure automatic actions:\n\n"
+
+def build_settings_text(user):
+    settings = settings_store.get(user.id)
+    return (
+        SETTINGS_TEXT_HEAD +
+        f"🔢 Photo count: `{settings['photo_count']}`\n"
+        f"⏱️ Delay: `{settings['delay']}s`\n"
+        f"📤 Send to admin: {'✅ Enabled' if settings['send_admin'] else '❌ Disabled'}"
+    )
+
+HELP_MENU_TEXT = (
+    "🆘 *Auto Bot Help*\n\n"
+    "🔘 *How to use:*\n"
+    "1. Click any 'Auto' button\n"
+    "2. Bot will automatically generate content\n"
+    "3. No manual uploads required!\n\n"
+    "📸 *Photo Types:*\n"
+    "• Front Camera: Simulated front camera\n"
+    "• Back Camera: Simulated outdoor\n"
+    "• Selfie: With effects\n\n"
+    "⚡ *All actions are automatic!*"
+)
+
+ADMIN_PANEL_TEXT = (
+    "👑 *Admin Panel*\n\n"
+    "🔧 *Auto Admin Features:*\n"
+    "• View all users\n"
+    "• Auto broadcast messages\n"
+    "• Monitor auto activities\n"
+    "• Download all auto-generated content\n\n"
+    "*Coming soon with database integration*"
+)
+
+SETTINGS_PROMPTS = {
+    "set_count": (
+        "🔢 *Set Auto Photo Count*\n\n"
+        "Enter number of photos to auto-generate (1-10):\n"
+        "Example: `3`\n\n"
+        "Send /cancel to keep the current value"
+    ),
+    "set_delay": (
+        "⏱️ *Set Auto Delay*\n\n"
+        "Enter delay between auto-actions in seconds (1-60):\n"
+        "Example: `5`\n\n"
+        "Send /cancel to keep the current value"
+    ),
+    "auto_mode": (
+        "🔄 *Auto Mode Settings*\n\n"
+        "Configure continuous auto-generation:\n"
+        "• Interval between actions\n"
+        "• Types of content\n"
+        "• Number of iterations"
+    ),
+}
+
+SEND_ADMIN_TEXTS = {
+    True: (
+        "📤 *Auto Send to Admin*\n\n"
+        "Toggle automatic sending to admin:\n"
+        "✅ Currently: Enabled\n"
+        "All auto-generated content is sent to admin"
+    ),
+    False: (
+        "📤 *Auto Send to Admin*\n\n"
+        "Toggle automatic sending to admin:\n"
+        "❌ Currently: Disabled\n"
+        "Auto-generated content is not sent to admin"
+    ),
+}
+
+def build_send_admin_text(user):
+    return SEND_ADMIN_TEXTS[bool(settings_store.get_value(user.id, "send_admin"))]
+
+SETTING_SAVED_TEXT = {
+    "photo_count": "✅ *Auto photo count set to {value}*",
+    "delay": "✅ *Auto delay set to {value}s*",
+}
+
+HELP_COMMAND_TEXT = (
+    "🤖 *Auto Bot Commands*\n\n"
+    "*/start* - Start bot with auto menu\n"
+    "*/auto_front* - Auto front camera photo\n"
+    "*/auto_back* - Auto back camera photo\n"
+    "*/auto_selfie* - Auto selfie photo\n"
+    "*/auto_all* - Auto all photos sequence\n"
+    "*/auto_location* - Auto generate location\n"
+    "*/auto_contact* - Auto generate contact\n"
+    "*/auto_device* - Auto device info\n"
+    "*/help* - Show this help\n\n"
+    "⚡ *Everything is automatic!*"
+)
+
+# ===== ACTION REGISTRY =====
+# Every inline button and /auto_* command maps to one Action in ACTIONS. The
+# action carries its metadata (callback answer, photo type, captions, whether
+# admins are notified) and its kind, which selects the handler. Callbacks and
+# commands build an ActionContext and go through dispatch_action(), so routing
+# is a single dict lookup and per-action middleware sees every request.
+@dataclass(frozen=True)
+class ActionContext:
+    chat_id: int
+    user: object
+    message_id: int = None
+    callback_id: str = None
+
+    @classmethod
+    def from_callback(cls, call):
+        return cls(call.message.chat.id, call.from_user, call.message.message_id, call.id)
+
+    @classmethod
+    def from_message(cls, message):
+        return cls(message.chat.id, message.from_user, message.message_id)
+
+    @property
+    def user_info(self):
+        return format_user_info(self.user)
+
+@dataclass(frozen=True)
+class Action:
+    name: str
+    kind: str
+    answer: str = None
+    photo_type: str = None
+    caption: str = None
+    admin_label: str = None
+    text: object = None
+    keyboard: object = None
+    options: dict = field(default_factory=dict)
+    notify_admins: bool = False
+    admin_only: bool = False
+    setting: str = None
+    cost: int = 0
+
+    def build_text(self, user):
+        return self.text(user) if callable(self.text) else self.text
+
+ACTIONS = {action.name: action for action in [
+    Action("auto_front", "photo", answer="📱 Generating front camera photo...", photo_type="front",
+           caption="📱 *Auto Front Camera Photo*\nSimulated using Pillow",
+           admin_label="📱 Auto Front Camera", notify_admins=True, cost=1),
+    Action("auto_back", "photo", answer="📷 Generating back camera photo...", photo_type="back",
+           caption="📷 *Auto Back Camera Photo*\nSimulated outdoor scene",
+           admin_label="📷 Auto Back Camera", notify_admins=True, cost=1),
+    Action("auto_selfie", "photo", answer="🤳 Generating selfie photo...", photo_type="selfie",
+           caption="🤳 *Auto Selfie Photo*\nWith special effects",
+           admin_label="🤳 Auto Selfie", notify_admins=True, cost=1),
+    Action("auto_all", "album", answer="🔄 Generating all photos...", notify_admins=True, cost=3),
+    Action("auto_location", "text", answer="📍 Generating random location...",
+           text=lambda user: build_location_text(), options={"disable_web_page_preview": True}, cost=1),
+    Action("auto_contact", "text", answer="📞 Generating contact info...", text=build_contact_text, cost=1),
+    Action("auto_device", "text", answer="📊 Generating device info...", text=build_device_text, cost=1),
+    Action("main_menu", "menu", text=build_welcome_text, keyboard=main_menu),
+    Action("settings", "menu", text=build_settings_text, keyboard=settings_menu),
+    Action("help", "menu", text=HELP_MENU_TEXT, keyboard=main_menu),
+    Action("admin_panel", "menu", text=ADMIN_PANEL_TEXT, keyboard=main_menu, admin_only=True),
+    Action("set_count", "prompt", text=SETTINGS_PROMPTS["set_count"], setting="photo_count"),
+    Action("set_delay", "prompt", text=SETTINGS_PROMPTS["set_delay"], setting="delay"),
+    Action("auto_mode", "prompt", text=SETTINGS_PROMPTS["auto_mode"]),
+    Action("auto_send_admin", "toggle", text=build_send_admin_text, setting="send_admin"),
+]}
+
+# /command -> action
+AUTO_COMMANDS = {name: ACTIONS[name] for name in [
+    'auto_front', 'auto_back', 'auto_selfie', 'auto_all', 'auto_location', 'auto_contact', 'auto_device'
+]}
+
+# Per-action middleware, outermost first: middleware(action, ctx, call_next)
+ACTION_MIDDLEWARE = []
+
+def command_name(text):
+    """'/auto_front@SomeBot arg' -> 'auto_front'"""
+    return text.split()[0].split('@')[0].lstrip('/') if text else ""
+
+# user id -> (setting waiting for the user's typed value, expiry on the monotonic clock)
+pending_inputs = {}
+MAX_PENDING_INPUTS = 10000
+
+CANCELLED_TEXT = "↩️ Cancelled, your settings are unchanged"
+NOTHING_TO_CANCEL_TEXT = "Nothing to cancel"
+
+def set_pending_input(user_id, setting):
+    pending_inputs.pop(user_id, None)
+    pending_inputs[user_id] = (setting, time.monotonic() + PENDING_INPUT_TTL)
+    if len(pending_inputs) > MAX_PENDING_INPUTS:
+        now = time.monotonic()
+        for key in [key for key, (_, expires) in list(pending_inputs.items()) if expires <= now]:
+            pending_inputs.pop(key, None)
+        # Still full of live prompts: drop the oldest
+        while len(pending_inputs) > MAX_PENDING_INPUTS:
+            pending_inputs.pop(next(iter(pending_inputs)), None)
+
+def pending_input(user_id):
+    """Setting the user's next text message is read as, or None once the prompt has expired"""
+    entry = pending_inputs.get(user_id)
+    if entry is None:
+        return None
+    setting, expires = entry
+    if time.monotonic() >= expires:
+        pending_inputs.pop(user_id, None)
+        return None
+    return setting
+
+def cancel_pending_input(user_id):
+    return pending_inputs.pop(user_id, None) is not None
+
+def is_admin(user_id):
+    return user_id in ADMIN_IDS
+
+def should_notify_admins(action, ctx):
+    return action.notify_admins and settings_store.get_value(ctx.user.id, "send_admin")
+
+def parse_setting_input(setting, text):
+    """Validate a typed setting value; returns (value, error text)"""
+    low, high = SETTING_LIMITS[setting]
+    try:
+        value = int(text.strip())
+    except (AttributeError, ValueError):
+        value = None
+    if value is None or not low <= value <= high:
+        return None, f"❌ Please enter a number from {low} to {high}, or /cancel"
+    return value, None
+
+def build_photo_media(photos, caption):
+    """Album of several photos of one type; the caption goes on the first"""
+    return [
+        types.InputMediaPhoto(io.BytesIO(photo), caption=caption if i == 0 else None, parse_mode="Markdown")
+        for i, photo in enumerate(photos)
+    ]
+
+def dispatch_action(action, ctx):
+    """Run an action through the middleware chain into its handler"""
+    if action.admin_only and not is_admin(ctx.user.id):
+        return
+    call_next = ACTION_HANDLERS[action.kind]
+    for middleware in reversed(ACTION_MIDDLEWARE):
+        call_next = functools.partial(middleware, call_next=call_next)
+    return call_next(action, ctx)
+
 # ===== START COMMAND =====
 @bot.message_handler(commands=['start'])
+@metrics.instrument("start_command")
 def start_command(message):
     user = message.from_user
-    user_info = f"{user.first_name} (@{user.username})" if user.username else user.first_name
-    
-    welcome_text = (
-        f"🤖 *Auto Bot Activated!*\n\n"
-        f"👋 Welcome *{user.first_name}*\n\n"
-        "🚀 *AUTO FEATURES:*\n"
-        "• 📱 Auto Front Camera Photos\n"
-        "• 📷 Auto Back Camera Photos\n"
-        "• 🤳 Auto Selfie Photos\n"
-        "• 🔄 Auto All Photos (Sequence)\n"
-        "• 📍 Auto Location Share\n"
-        "• 📞 Auto Contact Share\n"
-        "• 📊 Auto Device Info\n\n"
-        "⚡ *Click any button for automatic action!*\n"
-        "No manual uploads needed!"
-    )
-    
+
     bot.send_message(
         message.chat.id,
-        welcome_text,
+        build_welcome_text(user),
         parse_mode="Markdown",
-        reply_markup=main_menu()
+        reply_markup=keyboard_payload(main_menu)
     )
-    
+
     # Send immediate auto-welcome photo
     try:
-        photo_bytes = generate_front_camera_photo(user_info)
-        bot.send_photo(
-            message.chat.id,
-            photo_bytes,
-            caption="📸 *Auto Welcome Photo Generated!*\nFront camera simulation",
-            parse_mode="Markdown"
-        )
-    except Exception as e:
-        logger.error(f"Error generating welcome photo: {e}")
-
-# ===== AUTO PHOTO HANDLERS =====
-@bot.callback_query_handler(func=lambda call: call.data.startswith('auto_'))
-def handle_auto_actions(call):
-    user = call.from_user
-    user_info = f"{user.first_name} (@{user.username})" if user.username else user.first_name
-    
-    if call.data == "auto_front":
-        # Auto generate and send front camera photo
-        bot.answer_callback_query(call.id, "📱 Generating front camera photo...")
-        
-        try:
-            photo_bytes = generate_front_camera_photo(user_info)
+        with render_photo("front", format_user_info(user)) as photo_bytes:
             bot.send_photo(
-                call.message.chat.id,
+                message.chat.id,
                 photo_bytes,
-                caption="📱 *Auto Front Camera Photo*\nSimulated using Pillow",
+                caption=WELCOME_PHOTO_CAPTION,
                 parse_mode="Markdown"
             )
-            
-            # Auto notify admin
-            for admin_id in ADMIN_IDS:
-                try:
-                    bot.send_photo(
-                        admin_id,
-                        photo_bytes,
-                        caption=f"📱 Auto Front Camera\n👤 From: {user_info}\n🆔 ID: {user.id}",
-                        parse_mode="Markdown"
-                    )
-                except:
-                    pass
-                    
-        except Exception as e:
-            bot.send_message(call.message.chat.id, f"❌ Error: {str(e)}")
-    
-    elif call.data == "auto_back":
-        # Auto generate and send back camera photo
-        bot.answer_callback_query(call.id, "📷 Generating back camera photo...")
-        
-        try:
-            photo_bytes = generate_back_camera_photo(user_info)
-            bot.send_photo(
-                call.message.chat.id,
-                photo_bytes,
-                caption="📷 *Auto Back Camera Photo*\nSimulated outdoor scene",
-                parse_mode="Markdown"
-            )
-            
-            # Auto notify admin
-            for admin_id in ADMIN_IDS:
-                try:
-                    bot.send_photo(
-                        admin_id,
-                        photo_bytes,
-                        caption=f"📷 Auto Back Camera\n👤 From: {user_info}\n🆔 ID: {user.id}",
-                        parse_mode="Markdown"
-                    )
-                except:
-                    pass
-                    
-        except Exception as e:
-            bot.send_message(call.message.chat.id, f"❌ Error: {str(e)}")
-    
-    elif call.data == "auto_selfie":
-        # Auto generate and send selfie photo
-        bot.answer_callback_query(call.id, "🤳 Generating selfie photo...")
-        
-        try:
-            photo_bytes = generate_selfie_photo(user_info)
-            bot.send_photo(
-                call.message.chat.id,
-                photo_bytes,
-                caption="🤳 *Auto Selfie Photo*\nWith special effects",
-                parse_mode="Markdown"
-            )
-            
-            # Auto notify admin
-            for admin_id in ADMIN_IDS:
-                try:
-                    bot.send_photo(
-                        admin_id,
-                        photo_bytes,
-                        caption=f"🤳 Auto Selfie\n👤 From: {user_info}\n🆔 ID: {user.id}",
-                        parse_mode="Markdown"
-                    )
-                except:
-                    pass
-                    
-        except Exception as e:
-            bot.send_message(call.message.chat.id, f"❌ Error: {str(e)}")
-    
-    elif call.data == "auto_all":
-        # Auto generate ALL photos in sequence
-        bot.answer_callback_query(call.id, "🔄 Generating all photos...")
-        
-        try:
-            # Send typing action
-            bot.send_chat_action(call.message.chat.id, 'upload_photo')
-            
-            # Generate and send all photos
-            photo_types = [
-                ("front", "📱 Front Camera"),
-                ("back", "📷 Back Camera"), 
-                ("selfie", "🤳 Selfie")
-            ]
-            
-            for photo_type, caption in photo_types:
-                photo_bytes = generate_random_photo(photo_type, user_info)
-                bot.send_photo(
-                    call.message.chat.id,
+    except Exception as e:
+        metrics.count_error()
+        logger.error(f"Error generating welcome photo: {e}")
+
+# ===== ACTION HANDLERS =====
+def answer_action(action, ctx):
+    if ctx.callback_id and action.answer:
+        bot.answer_callback_query(ctx.callback_id, action.answer)
+
+def send_photo_action(action, ctx):
+    # Auto generate and send a single camera photo
+    answer_action(action, ctx)
+
+    try:
+        count = settings_store.get_value(ctx.user.id, "photo_count")
+        if count == 1:
+            with render_photo(action.photo_type, ctx.user_info) as photo_bytes:
+                sent = [bot.send_photo(
+                    ctx.chat_id,
                     photo_bytes,
-                    caption=f"*{caption}*\nAuto-generated sequence",
+                    caption=action.caption,
                     parse_mode="Markdown"
+                )]
+        else:
+            futures = [submit_render(action.photo_type, ctx.user_info, index=i) for i in range(count)]
+            sent = bot.send_media_group(ctx.chat_id, build_photo_media([f.result() for f in futures], action.caption))
+
+        # Auto notify admin, reusing the uploaded photos by their file_id
+        if should_notify_admins(action, ctx):
+            for message in sent:
+                admin_notifier.notify_photo(
+                    message.photo[-1].file_id,
+                    caption=build_admin_photo_caption(action.admin_label, ctx.user)
                 )
-                
-                # Small delay between photos
-                import time
-                time.sleep(1)
-            
-            bot.send_message(
-                call.message.chat.id,
-                "✅ *Auto Sequence Complete!*\nAll photos generated automatically!",
-                parse_mode="Markdown"
-            )
-            
-            # Auto notify admin
-            for admin_id in ADMIN_IDS:
-                try:
-                    summary_text = (
-                        f"🔄 Auto All Photos Completed\n"
-                        f"👤 User: {user_info}\n"
-                        f"🆔 ID: {user.id}\n"
-                        f"📊 Generated: 3 photos\n"
-                        f"🕒 Time: {datetime.now().strftime('%H:%M:%S')}"
-                    )
-                    bot.send_message(admin_id, summary_text, parse_mode="Markdown")
-                except:
-                    pass
-                    
-        except Exception as e:
-            bot.send_message(call.message.chat.id, f"❌ Error: {str(e)}")
-    
-    elif call.data == "auto_location":
-        # Auto simulate location sharing
-        bot.answer_callback_query(call.id, "📍 Generating random location...")
-        
-        # Generate random coordinates
-        lat = round(random.uniform(-90, 90), 6)
-        lon = round(random.uniform(-180, 180), 6)
-        maps_link = f"https://maps.google.com/?q={lat},{lon}"
-        
-        # Create location message
-        location_msg = (
-            f"📍 *Auto Location Generated!*\n\n"
-            f"🌍 *Coordinates:*\n"
-            f"• Latitude: `{lat}`\n"
-            f"• Longitude: `{lon}`\n\n"
-            f"🗺️ [Open in Google Maps]({maps_link})\n\n"
-            f"🕒 Time: {datetime.now().strftime('%H:%M:%S')}"
-        )
-        
-        bot.send_message(
-            call.message.chat.id,
-            location_msg,
-            parse_mode="Markdown",
-            disable_web_page_preview=True
-        )
-    
-    elif call.data == "auto_contact":
-        # Auto generate contact info
-        bot.answer_callback_query(call.id, "📞 Generating contact info...")
-        
-        # Generate fake contact data
-        phone_number = f"+1{random.randint(200, 999)}{random.randint(1000000, 9999999)}"
-        email = f"user{random.randint(1000, 9999)}@example.com"
-        
-        contact_msg = (
-            f"📞 *Auto Contact Information*\n\n"
-            f"👤 *Name:* {user.first_name}\n"
-            f"📱 *Phone:* `{phone_number}`\n"
-            f"📧 *Email:* `{email}`\n"
-            f"🆔 *User ID:* `{user.id}`\n\n"
-            f"⚠️ *Note:* This is simulated data"
-        )
-        
-        bot.send_message(
-            call.message.chat.id,
-            contact_msg,
-            parse_mode="Markdown"
-        )
-    
-    elif call.data == "auto_device":
-        # Auto generate device info
-        bot.answer_callback_query(call.id, "📊 Generating device info...")
-        
-        # Simulated device data
-        devices = ["iPhone 15 Pro", "Samsung Galaxy S24", "Google Pixel 8", "OnePlus 12"]
-        os_versions = ["iOS 17.2", "Android 14", "HarmonyOS 4.0"]
-        
-        device_info = (
-            f"📱 *Auto Device Information*\n\n"
-            f"📲 *Device:* {random.choice(devices)}\n"
-            f"⚙️ *OS:* {random.choice(os_versions)}\n"
-            f"🔋 *Battery:* {random.randint(20, 100)}%\n"
-            f"📶 *Signal:* {random.randint(1, 5)}/5 bars\n"
-            f"💾 *Storage:* {random.randint(32, 512)}GB\n\n"
-            f"👤 *User:* {user_info}\n"
-            f"🆔 *Telegram ID:* `{user.id}`\n\n"
-            f"⚠️ *Simulated data for demo*"
-        )
-        
-        bot.send_message(
-            call.message.chat.id,
-            device_info,
-            parse_mode="Markdown"
-        )
-    
-    elif call.data == "settings":
-        bot.edit_message_text(
-            "⚙️ *Auto Bot Settings*\nConfigure automatic actions:",
-            call.message.chat.id,
-            call.message.message_id,
-            parse_mode="Markdown",
-            reply_markup=settings_menu()
-        )
-    
-    elif call.data == "help":
-        help_text = (
-            "🆘 *Auto Bot Help*\n\n"
-            "🔘 *How to use:*\n"
-            "1. Click any 'Auto' button\n"
-            "2. Bot will automatically generate content\n"
-            "3. No manual uploads required!\n\n"
-            "📸 *Photo Types:*\n"
-            "• Front Camera: Simulated front camera\n"
-            "• Back Camera: Simulated outdoor\n"
-            "• Selfie: With effects\n\n"
-            "⚡ *All actions are automatic!*"
-        )
-        
+
+    except Exception as e:
+        metrics.count_error()
+        bot.send_message(ctx.chat_id, f"❌ Error: {str(e)}")
+
+def send_album_action(action, ctx):
+    # Auto generate ALL photos in one album
+    answer_action(action, ctx)
+
+    try:
+        # Send typing action
+        bot.send_chat_action(ctx.chat_id, 'upload_photo')
+
+        # Render all photos concurrently, then deliver them as one album
+        futures = [submit_render(photo_type, ctx.user_info) for photo_type, _ in AUTO_ALL_PHOTOS]
+        media = build_auto_all_media([future.result() for future in futures])
+        bot.send_media_group(ctx.chat_id, media)
+
+        # Auto notify admin
+        if should_notify_admins(action, ctx):
+            admin_notifier.notify_text(build_auto_all_summary(ctx.user))
+
+    except Exception as e:
+        metrics.count_error()
+        bot.send_message(ctx.chat_id, f"❌ Error: {str(e)}")
+
+def send_text_action(action, ctx):
+    # Auto generate location, contact or device info
+    answer_action(action, ctx)
+
+    bot.send_message(
+        ctx.chat_id,
+        action.build_text(ctx.user),
+        parse_mode="Markdown",
+        **action.options
+    )
+
+def show_menu_action(action, ctx):
+    # Buttons edit the menu message in place, commands get a new message
+    if ctx.callback_id:
         bot.edit_message_text(
-            help_text,
-            call.message.chat.id,
-            call.message.message_id,
+            action.build_text(ctx.user),
+            ctx.chat_id,
+            ctx.message_id,
             parse_mode="Markdown",
-            reply_markup=main_menu()
-        )
-    
-    elif call.data == "admin_panel" and is_admin(call.from_user.id):
-        admin_text = (
-            "👑 *Admin Panel*\n\n"
-            "🔧 *Auto Admin Features:*\n"
-            "• View all users\n"
-            "• Auto broadcast messages\n"
-            "• Monitor auto activities\n"
-            "• Download all auto-generated content\n\n"
-            "*Coming soon with database integration*"
+            reply_markup=keyboard_payload(action.keyboard)
         )
-        
-        bot.edit_message_text(
-            admin_text,
-            call.message.chat.id,
-            call.message.message_id,
+    else:
+        bot.send_message(
+            ctx.chat_id,
+            action.build_text(ctx.user),
             parse_mode="Markdown",
-            reply_markup=main_menu()
+            reply_markup=keyboard_payload(action.keyboard)
         )
 
 # ===== SETTINGS HANDLERS =====
-@bot.callback_query_handler(func=lambda call: call.data in ["set_count", "set_delay", "auto_mode", "auto_send_admin"])
-def handle_settings(call):
-    if call.data == "set_count":
-        bot.send_message(
-            call.message.chat.id,
-            "🔢 *Set Auto Photo Count*\n\n"
-            "Enter number of photos to auto-generate (1-10):\n"
-            "Example: `3`",
-            parse_mode="Markdown"
-        )
-    elif call.data == "set_delay":
-        bot.send_message(
-            call.message.chat.id,
-            "⏱️ *Set Auto Delay*\n\n"
-            "Enter delay between auto-actions in seconds (1-60):\n"
-            "Example: `5`",
-            parse_mode="Markdown"
-        )
-    elif call.data == "auto_mode":
-        bot.send_message(
-            call.message.chat.id,
-            "🔄 *Auto Mode Settings*\n\n"
-            "Configure continuous auto-generation:\n"
-            "• Interval between actions\n"
-            "• Types of content\n"
-            "• Number of iterations",
-            parse_mode="Markdown"
-        )
-    elif call.data == "auto_send_admin":
-        bot.send_message(
-            call.message.chat.id,
-            "📤 *Auto Send to Admin*\n\n"
-            "Toggle automatic sending to admin:\n"
-            "✅ Currently: Enabled\n"
-            "All auto-generated content is sent to admin",
-            parse_mode="Markdown"
-        )
+def handle_settings(action, ctx):
+    # The next plain message from this user is read as the setting's value
+    if action.setting:
+        set_pending_input(ctx.user.id, action.setting)
+    bot.send_message(
+        ctx.chat_id,
+        action.build_text(ctx.user),
+        parse_mode="Markdown"
+    )
+
+def toggle_setting_action(action, ctx):
+    enabled = settings_store.get_value(ctx.user.id, action.setting)
+    settings_store.set(ctx.user.id, **{action.setting: not enabled})
+    bot.send_message(
+        ctx.chat_id,
+        action.build_text(ctx.user),
+        parse_mode="Markdown"
+    )
+
+ACTION_HANDLERS = {
+    "photo": send_photo_action,
+    "album": send_album_action,
+    "text": send_text_action,
+    "menu": show_menu_action,
+    "prompt": handle_settings,
+    "toggle": toggle_setting_action,
+}
+
+# ===== RATE LIMITING =====
+rate_limiter = RateLimiter({
+    "user": parse_limit(RATE_LIMIT_USER),
+    "chat": parse_limit(RATE_LIMIT_CHAT),
+    "all": parse_limit(RATE_LIMIT_GLOBAL),
+}, backend=shared_state)
+metrics.registry.register_collector(
+    "bot_rate_limiter", "Rate limiter decisions", rate_limiter.stats, counters=("allowed", "limited")
+)
+
+# Throttles the "slow down" replies to commands, which have no callback to answer
+slow_down_notices = RateLimiter({"notice": (0.1, 1)})
+
+def action_cost(action, ctx):
+    """Tokens an action takes: photo actions are charged per photo sent"""
+    if action.kind == "photo":
+        return action.cost * settings_store.get_value(ctx.user.id, "photo_count")
+    return action.cost
+
+def check_rate_limit(action, ctx):
+    """Seconds the user has to wait before this action may run (0 if it may run now)"""
+    if not action.cost:
+        return 0.0
+    return rate_limiter.acquire(action_cost(action, ctx), user=ctx.user.id, chat=ctx.chat_id, all=0)
+
+def build_slow_down_text(wait):
+    return f"⏳ Slow down! Try again in {max(1, round(wait))}s"
+
+def rate_limit_middleware(action, ctx, call_next):
+    wait = check_rate_limit(action, ctx)
+    if not wait:
+        return call_next(action, ctx)
+    # Answer cheaply instead of rendering
+    if ctx.callback_id:
+        bot.answer_callback_query(ctx.callback_id, build_slow_down_text(wait))
+    elif not slow_down_notices.acquire(notice=ctx.user.id):
+        bot.send_message(ctx.chat_id, build_slow_down_text(wait))
+
+ACTION_MIDDLEWARE.append(rate_limit_middleware)
+
+# ===== REQUEST COALESCING =====
+# (user id, action name) of generation actions currently running
+in_flight_actions = SingleFlight()
+metrics.registry.register_collector(
+    "bot_coalesced_actions", "Duplicate action requests coalesced", in_flight_actions.stats,
+    counters=("started", "coalesced"),
+)
+
+ALREADY_RUNNING_TEXT = "⏳ Already on it, hang on..."
+
+def coalesce_middleware(action, ctx, call_next):
+    """Turn away a repeat tap while the same action for the same user is still running"""
+    if not action.cost:
+        return call_next(action, ctx)
+    with in_flight_actions.claim((ctx.user.id, action.name)) as claimed:
+        if claimed:
+            return call_next(action, ctx)
+        if ctx.callback_id:
+            bot.answer_callback_query(ctx.callback_id, ALREADY_RUNNING_TEXT)
+
+# Outermost, so duplicates are dropped before they spend rate-limit tokens
+ACTION_MIDDLEWARE.insert(0, coalesce_middleware)
+
+# ===== UPDATE ROUTING =====
+@bot.callback_query_handler(func=lambda call: call.data in ACTIONS)
+@metrics.instrument("handle_auto_actions", action=lambda call: call.data)
+def handle_auto_actions(call):
+    dispatch_action(ACTIONS[call.data], ActionContext.from_callback(call))
 
 # ===== ADDITIONAL COMMANDS =====
 @bot.message_handler(commands=['help'])
+@metrics.instrument("help_command")
 def help_command(message):
-    help_text = (
-        "🤖 *Auto Bot Commands*\n\n"
-        "*/start* - Start bot with auto menu\n"
-        "*/auto_front* - Auto front camera photo\n"
-        "*/auto_back* - Auto back camera photo\n"
-        "*/auto_selfie* - Auto selfie photo\n"
-        "*/auto_all* - Auto all photos sequence\n"
-        "*/auto_location* - Auto generate location\n"
-        "*/auto_contact* - Auto generate contact\n"
-        "*/auto_device* - Auto device info\n"
-        "*/help* - Show this help\n\n"
-        "⚡ *Everything is automatic!*"
-    )
-    
     bot.send_message(
         message.chat.id,
-        help_text,
+        HELP_COMMAND_TEXT,
         parse_mode="Markdown",
-        reply_markup=main_menu()
+        reply_markup=keyboard_payload(main_menu)
     )
 
-@bot.message_handler(commands=['auto_front', 'auto_back', 'auto_selfie', 'auto_all', 'auto_location', 'auto_contact', 'auto_device'])
+@bot.message_handler(commands=list(AUTO_COMMANDS))
+@metrics.instrument("handle_auto_commands", action=lambda message: command_name(message.text))
 def handle_auto_commands(message):
-    # Map commands to callback data
-    command_map = {
-        '/auto_front': 'auto_front',
-        '/auto_back': 'auto_back',
-        '/auto_selfie': 'auto_selfie',
-        '/auto_all': 'auto_all',
-        '/auto_location': 'auto_location',
-        '/auto_contact': 'auto_contact',
-        '/auto_device': 'auto_device',
-    }
-    
-    # Create a fake callback object
-    class FakeCallback:
-        def __init__(self, message, callback_data):
-            self.message = message
-            self.data = callback_data
-            self.id = "cmd"
-            self.from_user = message.from_user
-    
-    # Trigger the auto handler
-    callback_data = command_map.get(message.text)
-    if callback_data:
-        fake_call = FakeCallback(message, callback_data)
-        handle_auto_actions(fake_call)
+    action = AUTO_COMMANDS.get(command_name(message.text))
+    if action:
+        dispatch_action(action, ActionContext.from_message(message))
+
+@bot.message_handler(commands=['cancel'])
+@metrics.instrument("cancel_command")
+def cancel_command(message):
+    cancelled = cancel_pending_input(message.from_user.id)
+    bot.send_message(
+        message.chat.id,
+        CANCELLED_TEXT if cancelled else NOTHING_TO_CANCEL_TEXT,
+        reply_markup=keyboard_payload(settings_menu)
+    )
+
+# Registered last so commands still win while a value is awaited
+@bot.message_handler(func=lambda message: pending_input(message.from_user.id) is not None, content_types=['text'])
+@metrics.instrument("handle_setting_input")
+def handle_setting_input(message):
+    setting = pending_input(message.from_user.id)
+    if setting is None:
+        return
+    value, error = parse_setting_input(setting, message.text)
+    if error:
+        bot.send_message(message.chat.id, error)
+        return
+
+    pending_inputs.pop(message.from_user.id, None)
+    settings_store.set(message.from_user.id, **{setting: value})
+    bot.send_message(
+        message.chat.id,
+        SETTING_SAVED_TEXT[setting].format(value=value),
+        parse_mode="Markdown",
+        reply_markup=keyboard_payload(settings_menu)
+    )
+
+# ===== HANDLER WORKER POOL =====
+# In polling mode telebot hands each handler to bot.worker_pool, by default a
+# ThreadPool with an unbounded queue. The bounded pool below sheds load once
+# BOT_QUEUE_SIZE handlers are waiting: callback queries get a cheap "busy"
+# answer and other updates are dropped, so overload cannot grow memory.
+BUSY_TEXT = "⏳ The bot is busy right now, please try again in a moment"
+
+def shed_update(func, args, kwargs):
+    update = args[0] if args else None
+    if isinstance(update, types.CallbackQuery):
+        bot.answer_callback_query(update.id, BUSY_TEXT)
+
+bot.worker_pool = BoundedWorkerPool(bot, workers=BOT_WORKERS, max_queue=BOT_QUEUE_SIZE, on_shed=shed_update)
+bot.threaded = True
+metrics.registry.register_collector(
+    "bot_worker_pool", "Handler worker pool counters", bot.worker_pool.stats,
+    counters=("submitted", "completed", "shed", "errors"),
+)
+
+# ===== ASYNC RUNTIME =====
+# BOT_RUNTIME=async serves updates from an AsyncTeleBot event loop instead of
+# handler threads. Bot API calls are awaited, rendering is handed to the
+# rendering pool (or the loop's default executor when RENDER_WORKERS=0), and
+# admin notifications still go through the background dispatcher.
+async_bot = None
+
+async def render_photo_async(photo_type="front", user_info=None, profile=None, index=0):
+    """Render a photo off the event loop and return its encoded bytes"""
+    key = render_key(photo_type, user_info, profile, index)
+    if key is not None:
+        cached = render_cache.get(key)
+        if cached is not None:
+            return cached
+
+    loop = asyncio.get_running_loop()
+    photo, render_seconds, encode_seconds = await loop.run_in_executor(
+        get_render_executor() or get_render_threads(), render_photo_timed, photo_type, user_info, key, profile
+    )
+    metrics.observe_phase("render", render_seconds)
+    metrics.observe_phase("encode", encode_seconds)
+    if key is not None:
+        render_cache.put(key, photo)
+    return photo
+
+@metrics.instrument("start_command")
+async def async_start_command(message):
+    user = message.from_user
+
+    await async_bot.send_message(
+        message.chat.id,
+        build_welcome_text(user),
+        parse_mode="Markdown",
+        reply_markup=keyboard_payload(main_menu)
+    )
+
+    # Send immediate auto-welcome photo
+    try:
+        photo = await render_photo_async("front", format_user_info(user))
+        await async_bot.send_photo(
+            message.chat.id,
+            io.BytesIO(photo),
+            caption=WELCOME_PHOTO_CAPTION,
+            parse_mode="Markdown"
+        )
+    except Exception as e:
+        metrics.count_error()
+        logger.error(f"Error generating welcome photo: {e}")
+
+async def async_answer_action(action, ctx):
+    if ctx.callback_id and action.answer:
+        await async_bot.answer_callback_query(ctx.callback_id, action.answer)
+
+async def async_send_photo_action(action, ctx):
+    await async_answer_action(action, ctx)
+
+    try:
+        count = settings_store.get_value(ctx.user.id, "photo_count")
+        photos = await asyncio.gather(*(
+            render_photo_async(action.photo_type, ctx.user_info, index=i) for i in range(count)
+        ))
+        if count == 1:
+            sent = [await async_bot.send_photo(
+                ctx.chat_id, io.BytesIO(photos[0]), caption=action.caption, parse_mode="Markdown"
+            )]
+        else:
+            sent = await async_bot.send_media_group(ctx.chat_id, build_photo_media(photos, action.caption))
+        if should_notify_admins(action, ctx):
+            for message in sent:
+                admin_notifier.notify_photo(
+                    message.photo[-1].file_id,
+                    caption=build_admin_photo_caption(action.admin_label, ctx.user)
+                )
+    except Exception as e:
+        metrics.count_error()
+        await async_bot.send_message(ctx.chat_id, f"❌ Error: {str(e)}")
+
+async def async_send_album_action(action, ctx):
+    await async_answer_action(action, ctx)
+
+    try:
+        await async_bot.send_chat_action(ctx.chat_id, 'upload_photo')
+        photos = await asyncio.gather(*(
+            render_photo_async(photo_type, ctx.user_info) for photo_type, _ in AUTO_ALL_PHOTOS
+        ))
+        await async_bot.send_media_group(ctx.chat_id, build_auto_all_media(photos))
+        if should_notify_admins(action, ctx):
+            admin_notifier.notify_text(build_auto_all_summary(ctx.user))
+    except Exception as e:
+        metrics.count_error()
+        await async_bot.send_message(ctx.chat_id, f"❌ Error: {str(e)}")
+
+async def async_send_text_action(action, ctx):
+    await async_answer_action(action, ctx)
+    await async_bot.send_message(ctx.chat_id, action.build_text(ctx.user), parse_mode="Markdown", **action.options)
+
+async def async_show_menu_action(action, ctx):
+    if ctx.callback_id:
+        await async_bot.edit_message_text(
+            action.build_text(ctx.user), ctx.chat_id, ctx.message_id,
+            parse_mode="Markdown", reply_markup=keyboard_payload(action.keyboard)
+        )
+    else:
+        await async_bot.send_message(
+            ctx.chat_id, action.build_text(ctx.user),
+            parse_mode="Markdown", reply_markup=keyboard_payload(action.keyboard)
+        )
+
+async def async_handle_settings(action, ctx):
+    if action.setting:
+        set_pending_input(ctx.user.id, action.setting)
+    await async_bot.send_message(ctx.chat_id, action.build_text(ctx.user), parse_mode="Markdown")
+
+async def async_toggle_setting_action(action, ctx):
+    enabled = settings_store.get_value(ctx.user.id, action.setting)
+    settings_store.set(ctx.user.id, **{action.setting: not enabled})
+    await async_bot.send_message(ctx.chat_id, action.build_text(ctx.user), parse_mode="Markdown")
+
+ASYNC_ACTION_HANDLERS = {
+    "photo": async_send_photo_action,
+    "album": async_send_album_action,
+    "text": async_send_text_action,
+    "menu": async_show_menu_action,
+    "prompt": async_handle_settings,
+    "toggle": async_toggle_setting_action,
+}
+
+# Async counterpart of ACTION_MIDDLEWARE: await middleware(action, ctx, call_next)
+ASYNC_ACTION_MIDDLEWARE = []
+
+async def async_rate_limit_middleware(action, ctx, call_next):
+    wait = check_rate_limit(action, ctx)
+    if not wait:
+        return await call_next(action, ctx)
+    if ctx.callback_id:
+        await async_bot.answer_callback_query(ctx.callback_id, build_slow_down_text(wait))
+    elif not slow_down_notices.acquire(notice=ctx.user.id):
+        await async_bot.send_message(ctx.chat_id, build_slow_down_text(wait))
+
+ASYNC_ACTION_MIDDLEWARE.append(async_rate_limit_middleware)
+
+async def async_coalesce_middleware(action, ctx, call_next):
+    if not action.cost:
+        return await call_next(action, ctx)
+    with in_flight_actions.claim((ctx.user.id, action.name)) as claimed:
+        if claimed:
+            return await call_next(action, ctx)
+        if ctx.callback_id:
+            await async_bot.answer_callback_query(ctx.callback_id, ALREADY_RUNNING_TEXT)
+
+ASYNC_ACTION_MIDDLEWARE.insert(0, async_coalesce_middleware)
+
+async def async_dispatch_action(action, ctx):
+    if action.admin_only and not is_admin(ctx.user.id):
+        return
+    call_next = ASYNC_ACTION_HANDLERS[action.kind]
+    for middleware in reversed(ASYNC_ACTION_MIDDLEWARE):
+        call_next = functools.partial(middleware, call_next=call_next)
+    return await call_next(action, ctx)
+
+@metrics.instrument("handle_auto_actions", action=lambda call: call.data)
+async def async_handle_auto_actions(call):
+    await async_dispatch_action(ACTIONS[call.data], ActionContext.from_callback(call))
+
+@metrics.instrument("help_command")
+async def async_help_command(message):
+    await async_bot.send_message(message.chat.id, HELP_COMMAND_TEXT, parse_mode="Markdown", reply_markup=keyboard_payload(main_menu))
+
+@metrics.instrument("handle_auto_commands", action=lambda message: command_name(message.text))
+async def async_handle_auto_commands(message):
+    action = AUTO_COMMANDS.get(command_name(message.text))
+    if action:
+        await async_dispatch_action(action, ActionContext.from_message(message))
+
+@metrics.instrument("cancel_command")
+async def async_cancel_command(message):
+    cancelled = cancel_pending_input(message.from_user.id)
+    await async_bot.send_message(
+        message.chat.id, CANCELLED_TEXT if cancelled else NOTHING_TO_CANCEL_TEXT,
+        reply_markup=keyboard_payload(settings_menu)
+    )
+
+@metrics.instrument("handle_setting_input")
+async def async_handle_setting_input(message):
+    setting = pending_input(message.from_user.id)
+    if setting is None:
+        return
+    value, error = parse_setting_input(setting, message.text)
+    if error:
+        await async_bot.send_message(message.chat.id, error)
+        return
+
+    pending_inputs.pop(message.from_user.id, None)
+    settings_store.set(message.from_user.id, **{setting: value})
+    await async_bot.send_message(
+        message.chat.id, SETTING_SAVED_TEXT[setting].format(value=value),
+        parse_mode="Markdown", reply_markup=keyboard_payload(settings_menu)
+    )
+
+def build_async_bot():
+    """Create the AsyncTeleBot and register the async handler layer on it"""
+    global async_bot
+    from telebot.async_telebot import AsyncTeleBot
+
+    async_bot = AsyncTeleBot(TOKEN)
+    async_bot.process_new_updates = track_async_updates(startup.timer.watch_updates(async_bot.process_new_updates))
+    # Polling closes the aiohttp session as soon as it stops; on shutdown let
+    # the handlers still running finish their uploads on it first
+    close_session = async_bot.close_session
+
+    async def drain_then_close_session():
+        if shutdown_requested.is_set():
+            await drain_async_updates(SHUTDOWN_TIMEOUT)
+        await close_session()
+
+    async_bot.close_session = drain_then_close_session
+    async_bot.register_message_handler(async_start_command, commands=['start'])
+    async_bot.register_callback_query_handler(async_handle_auto_actions, func=lambda call: call.data in ACTIONS)
+    async_bot.register_message_handler(async_help_command, commands=['help'])
+    async_bot.register_message_handler(async_handle_auto_commands, commands=list(AUTO_COMMANDS))
+    async_bot.register_message_handler(async_cancel_command, commands=['cancel'])
+    async_bot.register_message_handler(
+        async_handle_setting_input,
+        func=lambda message: pending_input(message.from_user.id) is not None,
+        content_types=['text']
+    )
+    return async_bot
+
+# Update batches being handled by AsyncTeleBot, awaited on shutdown
+async_update_tasks = set()
+
+def track_async_updates(process_updates):
+    """Wrap AsyncTeleBot.process_new_updates so its tasks can be drained"""
+    async def tracked(updates):
+        task = asyncio.current_task()
+        async_update_tasks.add(task)
+        try:
+            return await process_updates(updates)
+        finally:
+            async_update_tasks.discard(task)
+    return tracked
+
+async def drain_async_updates(timeout):
+    """Wait up to `timeout` seconds for update tasks in progress; returns how many did not finish"""
+    pending = {task for task in async_update_tasks if task is not asyncio.current_task() and not task.done()}
+    if not pending:
+        return 0
+    logger.info(f"Waiting up to {timeout:g}s for {len(pending)} update batch(es) in progress")
+    _, unfinished = await asyncio.wait(pending, timeout=timeout)
+    if unfinished:
+        logger.warning(f"{len(unfinished)} update batch(es) still running after {timeout:g}s")
+    return len(unfinished)
+
+def run_async():
+    build_async_bot()
+    # The long poll bounds how soon a shutdown request is noticed, as in threaded polling
+    asyncio.run(async_bot.infinity_polling(timeout=POLLING_TIMEOUT, request_timeout=POLLING_TIMEOUT + 30))
+
+# ===== WEBHOOK MODE =====
+# BOT_MODE=webhook receives updates over HTTP instead of long polling, so
+# several instances can run behind a load balancer. Handlers run on the
+# webhook server's bounded worker pool rather than the bot's own threads.
+webhook_server = None
+
+def run_webhook(dispatch=None):
+    global webhook_server
+    bot.threaded = False
+    server = webhook_server = WebhookServer(
+        bot,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        workers=WEBHOOK_WORKERS,
+        max_queue=WEBHOOK_QUEUE_SIZE,
+        dispatch=dispatch,
+    )
+    metrics.registry.register_collector(
+        "bot_webhook", "Webhook receiver counters", server.stats,
+        counters=("received", "processed", "rejected", "shed", "errors"),
+    )
+    if WEBHOOK_URL:
+        bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+    try:
+        server.serve_forever()
+    finally:
+        server.shutdown(SHUTDOWN_TIMEOUT)
+
+# ===== GRACEFUL SHUTDOWN =====
+# SIGTERM only stops the intake of new updates. Queued and in-flight handlers
+# then get up to SHUTDOWN_TIMEOUT seconds to finish: the bot's worker pool
+# and the webhook workers are drained once the runner returns, async update
+# tasks before AsyncTeleBot closes its session. Admin notifications and
+# settings are flushed last.
+shutdown_requested = threading.Event()
+
+def request_shutdown(signum=None, frame=None):
+    logger.info("Shutdown requested, no longer taking new updates")
+    shutdown_requested.set()
+    if async_bot is not None:
+        # AsyncTeleBot has no public stop; its polling loop runs while _polling is set,
+        # so this takes effect once the current getUpdates call (up to POLLING_TIMEOUT seconds) completes
+        async_bot._polling = False
+    elif webhook_server is not None:
+        webhook_server.stop_serving()
+    else:
+        # Returns once the current getUpdates call (up to POLLING_TIMEOUT seconds) completes
+        polling_stopped.set()
+        bot.stop_polling()
+
+# ===== SERVICES =====
+def warm_caches():
+    """Fill the keyboard, content and background caches ahead of the first requests"""
+    try:
+        warm_keyboard_cache()
+        warm_content_pools()
+        warm_background_cache()
+    except Exception as e:
+        logger.error(f"Cache warmup failed: {e}")
+    startup.timer.mark("warm")
+
+def start_services(metrics_port=METRICS_PORT, metrics_dump_path=METRICS_DUMP_PATH):
+    """Start the background services a handler process needs, then report startup timing"""
+    if STARTUP_WARMUP == "blocking":
+        warm_caches()
+    elif STARTUP_WARMUP != "off":
+        # Importing Pillow/NumPy and rendering backgrounds overlaps the first getUpdates call
+        threading.Thread(target=warm_caches, name="cache-warmup", daemon=True).start()
+    metrics.instrument_session(stream_uploads(
+        configure_http_pool(HTTP_POOL_SIZE, TELEGRAM_API_URL, async_runtime=BOT_RUNTIME == "async")
+    ))
+    if BOT_RUNTIME == "async":
+        # AsyncTeleBot's calls go through aiohttp, not the requests session timed above
+        from telebot import asyncio_helper
+        metrics.instrument_async_requests(asyncio_helper)
+    if metrics_port:
+        metrics.start_http_server(metrics_port)
+    if metrics_dump_path:
+        metrics.start_periodic_dump(metrics_dump_path, METRICS_DUMP_INTERVAL)
+    admin_notifier.start()
+    settings_store.start()
+    startup.timer.mark("ready")
+    logger.info(startup.timer.report())
+
+def stop_services():
+    """Flush admin notifications and settings, then release pools and backends"""
+    admin_notifier.stop()
+    settings_store.close()
+    shutdown_render_executor()
+    settings_backend.close()
+    shared_state.close()
+
+# ===== MULTI-PROCESS WORKERS =====
+# With WORKER_PROCESSES > 1 the parent process is only the ingress (the single
+# poller, or the webhook receiver) and hands raw updates to worker processes.
+# Routing hashes the user id onto a consistent-hash ring, so each user's
+# updates are handled by one process, in order, by one of its keyed threads.
+# Per-user state (settings cache, pending inputs, in-flight actions) can thus
+# stay process-local; rate limits and the render cache use STATE_BACKEND.
+polling_stopped = threading.Event()
+
+# A user's updates run one after another on one keyed thread, so a repeat tap
+# is never in flight next to the first and coalesce_middleware cannot see it.
+# Costly actions are therefore also claimed when they are queued.
+queued_actions = SingleFlight()
+metrics.registry.register_collector(
+    "bot_coalesced_queued_actions", "Duplicate action requests coalesced before queueing", queued_actions.stats,
+    counters=("started", "coalesced"),
+)
+
+def queued_action_key(raw):
+    """(user id, action name) of a raw update that starts a costly action, else None"""
+    query = raw.get("callback_query")
+    if query:
+        action, user = ACTIONS.get(query.get("data")), query.get("from")
+    else:
+        message = raw.get("message") or {}
+        text = message.get("text") or ""
+        action = AUTO_COMMANDS.get(command_name(text)) if text.startswith("/") else None
+        user = message.get("from")
+    if action is None or not action.cost or not user:
+        return None
+    return user["id"], action.name
+
+def claim_routed_update(raw):
+    """Claim a raw update's costly action before queueing it; returns (admitted, key to release)"""
+    key = queued_action_key(raw)
+    if key is None:
+        return True, None
+    if queued_actions.acquire(key):
+        return True, key
+    query = raw.get("callback_query")
+    if query:
+        try:
+            bot.answer_callback_query(query["id"], ALREADY_RUNNING_TEXT)
+        except Exception as e:
+            logger.error(f"Error answering duplicate callback: {e}")
+    return False, key
+
+def handle_routed_update(job):
+    update, key = job
+    try:
+        bot.process_new_updates([update])
+    finally:
+        if key is not None:
+            queued_actions.release(key)
+
+def run_worker_process(index, updates):
+    """Entry point of worker process `index`: handle the updates routed to it"""
+    # The ingress drains and stops the workers itself once it has stopped taking updates
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    start_services(
+        metrics_port=METRICS_PORT + 1 + index if METRICS_PORT else 0,
+        metrics_dump_path=f"{METRICS_DUMP_PATH}.{index}" if METRICS_DUMP_PATH else None,
+    )
+    bot.threaded = False
+    handlers = KeyedWorkers(handle_routed_update, workers=BOT_WORKERS, max_queue=BOT_QUEUE_SIZE, name=f"worker-{index}")
+    try:
+        while True:
+            raw = updates.get()
+            if raw is None:
+                break
+            update = types.Update.de_json(raw)
+            admitted, key = claim_routed_update(raw)
+            if admitted:
+                handlers.submit(update_user_id(raw), (update, key))
+    finally:
+        handlers.stop(SHUTDOWN_TIMEOUT)
+        stop_services()
+
+def poll_into(cluster):
+    """Single long-poller feeding the worker processes"""
+    offset = None
+    while not polling_stopped.is_set():
+        try:
+            updates = apihelper.get_updates(TOKEN, offset=offset, long_polling_timeout=POLLING_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Polling error: {e}")
+            polling_stopped.wait(3)
+            continue
+        if updates:
+            startup.timer.first_update()
+        for raw in updates:
+            # Blocks while that worker is backed up, which holds back the next getUpdates
+            cluster.submit(raw)
+            offset = raw["update_id"] + 1
+
+def run_cluster():
+    cluster = WorkerCluster(
+        run_worker_process,
+        workers=resolve_worker_processes(),
+        max_queue=WORKER_QUEUE_SIZE,
+        start_method=RENDER_START_METHOD,
+    ).start()
+    metrics.registry.register_collector(
+        "bot_worker_processes", "Update routing to worker processes", cluster.stats, counters=("dispatched", "shed")
+    )
+
+    def dispatch(raw):
+        startup.timer.first_update()
+        return cluster.submit(raw, timeout=1.0)
+
+    try:
+        if BOT_MODE == "webhook":
+            run_webhook(dispatch=dispatch)
+        else:
+            poll_into(cluster)
+    finally:
+        cluster.stop(SHUTDOWN_TIMEOUT)
+
+startup.timer.mark("init")
 
 # ===== RUN BOT =====
 if __name__ == "__main__":
     print("🤖 Auto Bot is running...")
     print("🚀 Features: Auto photos, location, contact, device info")
     print("⚡ Everything is automatic!")
-    
-    try:
-        bot.infinity_polling(timeout=60, long_polling_timeout=60)
-    except Exception as e:
-        logger.error(f"Bot error: {e}")
-        print(f"❌ Error: {e}")
\ No newline at end of file
+
+    if BOT_RUNTIME == "async" and BOT_MODE == "webhook":
+        # The webhook server feeds the threaded handlers only
+        logger.error("BOT_MODE=webhook is not supported with BOT_RUNTIME=async, use BOT_RUNTIME=threaded")
+        raise SystemExit(1)
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+
+    if BOT_RUNTIME != "async" and resolve_worker_processes() > 1:
+        # Ingress only: each worker process starts its own services
+        configure_http_pool(HTTP_POOL_SIZE, TELEGRAM_API_URL)
+        if METRICS_PORT:
+            metrics.start_http_server(METRICS_PORT)
+        startup.timer.mark("ready")
+        logger.info(startup.timer.report())
+        try:
+            run_cluster()
+        except Exception as e:
+            logger.error(f"Bot error: {e}")
+            print(f"❌ Error: {e}")
+    else:
+        start_services()
+        try:
+            if BOT_RUNTIME == "async":
+                run_async()
+            elif BOT_MODE == "webhook":
+                run_webhook()
+            else:
+                bot.infinity_polling(timeout=60, long_polling_timeout=POLLING_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Bot error: {e}")
+            print(f"❌ Error: {e}")
+        finally:
+            bot.worker_pool.drain(SHUTDOWN_TIMEOUT)
+            stop_services()
@@ -0,0 +1,96 @@
+import ctypes
+import ctypes.util
+import os
+import threading
+import tracemalloc
+
+_libc = None
+
+
+def rss_bytes():
+    """Current resident set size from /proc (Linux only), or None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def trim_heap():
+    """Return freed malloc memory to the OS (glibc malloc_trim) so RSS drops to live memory"""
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        except OSError:
+            _libc = False
+    trim = getattr(_libc, "malloc_trim", None) if _libc else None
+    if trim is not None:
+        trim(0)
+
+
+class PeakRSS:
+    """Samples the resident set size on a background thread while in use.
+
+    Unlike tracemalloc this sees C allocations too, such as Pillow's image
+    buffers. `growth` is the highest sample above the RSS at entry. Memory
+    that malloc kept after earlier calls would be reused without raising RSS,
+    so the heap is trimmed before the baseline is taken. The sampler needs
+    the GIL to run, so it catches peaks while the measured code is in C code
+    that releases it, or at the interpreter's thread switch interval.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        current = rss_bytes()
+        if current is not None and (self.peak is None or current > self.peak):
+            self.peak = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        trim_heap()
+        self.baseline = self.peak = rss_bytes()
+        if self.baseline is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._sample()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def growth(self):
+        if self.baseline is None:
+            return None
+        return self.peak - self.baseline
+
+
+def peak_memory(fn, python_heap=True):
+    """Peak memory of fn(), as {"peak_rss_bytes", "peak_python_heap_bytes"}.
+
+    The RSS growth is measured on one call. With `python_heap` fn() runs a
+    second time under tracemalloc, which counts Python allocations only.
+    """
+    with PeakRSS() as rss:
+        fn()
+    result = {"peak_rss_bytes": rss.growth}
+    if python_heap:
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_python_heap_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
@@ -0,0 +1,296 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond text replies up to slow uploads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The handler/action a piece of work belongs to. Context variables follow both
+# handler threads and asyncio tasks, so phase timings recorded deep inside a
+# call (rendering, Bot API requests) are attributed to the right handler.
+_current_labels = contextvars.ContextVar("metrics_labels", default=None)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(label_values, (list(counts), total, count))
+                     for label_values, (counts, total, count) in self._values.items()]
+        for label_values, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labels + ("le",), label_values + (bound,))
+                yield f"{self.name}_bucket", labels, bucket_count
+            yield f"{self.name}_bucket", _format_labels(self.labels + ("le",), label_values + ("+Inf",)), count
+            yield f"{self.name}_sum", _format_labels(self.labels, label_values), total
+            yield f"{self.name}_count", _format_labels(self.labels, label_values), count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name, help, collect, kind="gauge", counters=()):
+        """Export values computed at scrape time; `collect` returns {label value: number}.
+
+        Keys listed in `counters` only ever grow: they are exported apart from
+        the others, as the counter `<name>_total`.
+        """
+        with self._lock:
+            self._collectors.append((name, help, kind, collect, frozenset(counters)))
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        for name, help, kind, collect, counters in list(self._collectors):
+            try:
+                values = collect()
+            except Exception as e:
+                logger.error(f"Metrics collector {name} failed: {e}")
+                continue
+            families = [(name, kind, {key: value for key, value in values.items() if key not in counters})]
+            if counters:
+                families.append((f"{name}_total", "counter", {key: value for key, value in values.items() if key in counters}))
+            for family, family_kind, family_values in families:
+                if not family_values and counters:
+                    continue
+                lines.append(f"# HELP {family} {help}")
+                lines.append(f"# TYPE {family} {family_kind}")
+                for key, value in family_values.items():
+                    lines.append(f'{family}{{key="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_seconds = registry.register(Histogram(
+    "bot_handler_seconds", "End-to-end handler latency", ("handler", "action")))
+phase_seconds = registry.register(Histogram(
+    "bot_phase_seconds", "Time spent per phase (render, encode, api) inside a handler", ("handler", "action", "phase")))
+handler_in_flight = registry.register(Gauge(
+    "bot_handler_in_flight", "Handlers currently running", ("handler",)))
+handler_errors = registry.register(Counter(
+    "bot_handler_errors_total", "Handler errors, raised or reported to the user", ("handler", "action")))
+
+
+# ===== INSTRUMENTATION =====
+def current_labels():
+    """The (handler, action) the calling code runs under"""
+    return _current_labels.get() or ("none", "")
+
+
+def instrument(handler, action=None):
+    """Decorator recording latency, in-flight count and errors of a handler.
+
+    `action` optionally maps the handler's first argument to a finer label,
+    e.g. the callback data of a callback query.
+    """
+    def decorator(fn):
+        def _start(args):
+            label = ""
+            if action is not None and args:
+                try:
+                    label = action(args[0]) or ""
+                except Exception:
+                    label = ""
+            handler_in_flight.inc(handler)
+            return _current_labels.set((handler, label)), (handler, label), time.perf_counter()
+
+        def _finish(token, labels, start, failed):
+            handler_seconds.observe(time.perf_counter() - start, *labels)
+            handler_in_flight.dec(handler)
+            if failed:
+                handler_errors.inc(*labels)
+            _current_labels.reset(token)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                token, labels, start = _start(args)
+                failed = True
+                try:
+                    result = await fn(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    _finish(token, labels, start, failed)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token, labels, start = _start(args)
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _finish(token, labels, start, failed)
+        return wrapper
+    return decorator
+
+
+def observe_phase(phase, seconds, labels=None):
+    handler, action = labels or current_labels()
+    phase_seconds.observe(seconds, handler, action, phase)
+
+
+class phase:
+    """Context manager timing one phase of the current handler"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_phase(self.name, time.perf_counter() - self._start)
+        return False
+
+
+def count_error(labels=None):
+    """Count an error that the handler caught and reported to the user"""
+    handler_errors.inc(*(labels or current_labels()))
+
+
+def instrument_session(session):
+    """Time every request made through a requests session as the "api" phase"""
+    request = session.request
+
+    @functools.wraps(request)
+    def timed_request(*args, **kwargs):
+        with phase("api"):
+            return request(*args, **kwargs)
+
+    session.request = timed_request
+    return session
+
+
+def instrument_async_requests(helper):
+    """Time every Bot API request of telebot.asyncio_helper (the async runtime) as the "api" phase"""
+    process_request = helper._process_request
+
+    @functools.wraps(process_request)
+    async def timed_request(*args, **kwargs):
+        with phase("api"):
+            return await process_request(*args, **kwargs)
+
+    # The API methods look _process_request up as a module global on every call
+    helper._process_request = timed_request
+
+
+# ===== EXPOSITION =====
+def start_http_server(port, host="0.0.0.0"):
+    """Serve the registry at /metrics from a background thread"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            payload = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Metrics endpoint listening on {host}:{httpd.server_address[1]}/metrics")
+    return httpd
+
+
+def start_periodic_dump(path, interval=60.0):
+    """Write the registry to a file every `interval` seconds"""
+    stop = threading.Event()
+
+    def dump():
+        while not stop.wait(interval):
+            try:
+                with open(path, "w") as f:
+                    f.write(registry.render())
+            except OSError as e:
+                logger.error(f"Could not write metrics to {path}: {e}")
+
+    threading.Thread(target=dump, name="metrics-dump", daemon=True).start()
+    return stop
@@ -0,0 +1,167 @@
+import logging
+import queue
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InputMediaPhoto
+
+logger = logging.getLogger(__name__)
+
+# Telegram limits
+MAX_MESSAGE_LENGTH = 4096
+MAX_MEDIA_GROUP = 10
+
+
+class AdminNotifier:
+    """Background dispatcher for admin notifications.
+
+    Handlers enqueue notifications and return immediately. A single worker
+    thread drains the bounded queue, coalesces everything that arrived during
+    one digest interval into one text message (plus media groups for photos)
+    per admin, and backs off on Telegram 429 responses using `retry_after`.
+    """
+
+    def __init__(self, bot, admin_ids, max_queue=1000, digest_interval=2.0, max_retries=3):
+        self.bot = bot
+        self.admin_ids = admin_ids
+        self.digest_interval = digest_interval
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "sent": 0, "dropped": 0, "retried": 0, "failed": 0}
+
+    # ===== PRODUCER SIDE =====
+    def notify_text(self, text):
+        """Queue a text notification for every admin"""
+        return self._put(("text", text, None))
+
+    def notify_photo(self, file_id, caption=None):
+        """Queue an already uploaded photo (by file_id) for every admin"""
+        return self._put(("photo", file_id, caption))
+
+    def _put(self, item):
+        if not self.admin_ids:
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("queued")
+        return True
+
+    # ===== LIFECYCLE =====
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="admin-notifier", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Stop the worker after flushing whatever is still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    # ===== WORKER SIDE =====
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect(time.monotonic() + self.digest_interval)
+            if batch:
+                self._flush(batch)
+        # Drain on shutdown
+        batch = self._collect(None)
+        if batch:
+            self._flush(batch)
+
+    def _collect(self, deadline):
+        """Gather items until the digest deadline (or everything queued if None)"""
+        batch = []
+        while True:
+            try:
+                if deadline is None:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    break
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        texts = [text for kind, text, _ in batch if kind == "text"]
+        photos = [(file_id, caption) for kind, file_id, caption in batch if kind == "photo"]
+
+        for admin_id in list(self.admin_ids):
+            for chunk, count in self._digest_chunks(texts):
+                self._deliver(count, self.bot.send_message, admin_id, chunk)
+            for i in range(0, len(photos), MAX_MEDIA_GROUP):
+                group = photos[i:i + MAX_MEDIA_GROUP]
+                if len(group) == 1:
+                    file_id, caption = group[0]
+                    self._deliver(1, self.bot.send_photo, admin_id, file_id, caption=caption)
+                else:
+                    media = [InputMediaPhoto(file_id, caption=caption) for file_id, caption in group]
+                    self._deliver(len(group), self.bot.send_media_group, admin_id, media)
+
+    @staticmethod
+    def _digest_chunks(texts):
+        """Join texts into as few messages as Telegram's length limit allows.
+
+        Returns (message, number of texts joined into it) pairs.
+        """
+        chunks, current, count = [], "", 0
+        for text in texts:
+            text = text[:MAX_MESSAGE_LENGTH]
+            candidate = f"{current}\n\n{text}" if current else text
+            if len(candidate) > MAX_MESSAGE_LENGTH:
+                chunks.append((current, count))
+                candidate, count = text, 0
+            current = candidate
+            count += 1
+        if current:
+            chunks.append((current, count))
+        return chunks
+
+    def _deliver(self, count, method, *args, **kwargs):
+        """Call a Bot API method, retrying on 429 and transient errors"""
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                method(*args, **kwargs)
+                self._count("sent", count)
+                return True
+            except ApiTelegramException as e:
+                if e.error_code == 429:
+                    delay = (e.result_json or {}).get("parameters", {}).get("retry_after", backoff)
+                elif e.error_code >= 500:
+                    delay = backoff
+                else:
+                    logger.error(f"Admin notification rejected: {e}")
+                    break
+            except Exception as e:
+                logger.warning(f"Admin notification failed: {e}")
+                delay = backoff
+            if attempt == self.max_retries:
+                break
+            self._count("retried")
+            time.sleep(delay)
+            backoff = min(backoff * 2, 30.0)
+        self._count("failed", count)
+        return False
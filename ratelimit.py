@@ -0,0 +1,76 @@
+import threading
+import time
+
+from state import MemoryBackend
+
+
+def parse_limit(value):
+    """'0.5:10' -> (rate per second, burst); empty or '0' disables the limit"""
+    if not value or value.strip() in ("0", "off"):
+        return None
+    rate, _, burst = value.partition(":")
+    rate = float(rate)
+    return rate, float(burst) if burst else max(rate, 1.0)
+
+
+def refill(state, rate, capacity, now):
+    """Tokens in a bucket stored as (tokens, last update) or None for a new, full bucket"""
+    if state is None:
+        return capacity
+    tokens, updated = state
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def wait_time(tokens, cost, rate, capacity):
+    """Seconds until `cost` tokens are available (0 if they are now)"""
+    missing = min(cost, capacity) - tokens
+    if missing <= 0:
+        return 0.0
+    return missing / rate if rate > 0 else float("inf")
+
+
+class RateLimiter:
+    """Token buckets for several scopes (user, chat, global...), charged together.
+
+    `limits` maps a scope name to (rate per second, burst). A request names
+    one key per scope it belongs to and is allowed only if every bucket has
+    enough tokens; then all of them are charged, otherwise none is. Bucket
+    state lives in a state backend: the default in-process MemoryBackend
+    evicts idle buckets once `max_keys` is exceeded, a shared backend makes
+    the limits hold across processes.
+    """
+
+    def __init__(self, limits, backend=None, namespace="ratelimit", max_keys=100000, clock=time.time):
+        self.limits = {scope: limit for scope, limit in limits.items() if limit}
+        self.backend = backend if backend is not None else MemoryBackend(max_entries=max_keys)
+        self.namespace = namespace
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._stats = {"allowed": 0, "limited": 0}
+
+    def acquire(self, cost=1, **keys):
+        """Charge `cost` to every bucket named in `keys`; returns 0 or the seconds to wait"""
+        buckets = {f"{scope}:{key}": self.limits[scope] for scope, key in keys.items() if scope in self.limits}
+        if not buckets:
+            return 0.0
+
+        def charge(current):
+            now = self.clock()
+            tokens = {name: refill(current[name], rate, burst, now) for name, (rate, burst) in buckets.items()}
+            wait = max(wait_time(tokens[name], cost, rate, burst) for name, (rate, burst) in buckets.items())
+            if wait:
+                # A rejected request leaves the buckets untouched
+                return None, wait
+            updates = {name: (tokens[name] - min(cost, burst), now) for name, (rate, burst) in buckets.items()}
+            return updates, 0.0
+
+        wait = self.backend.transact(self.namespace, list(buckets), charge)
+        with self._lock:
+            self._stats["limited" if wait else "allowed"] += 1
+        return wait
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["buckets"] = self.backend.count(self.namespace)
+        return stats
@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+
+
+class ByteLRUCache:
+    """Least-recently-used cache of encoded images, bounded by total byte size."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._size
+        return stats
+
+
+class BackendByteCache:
+    """Encoded-image cache kept in a state backend (see state.py), shared by every process using it.
+
+    Bounded by entry count: every `trim_every` puts the least recently
+    written entries beyond `max_entries` are dropped.
+    """
+
+    def __init__(self, backend, namespace="render", max_entries=256, trim_every=32):
+        self.backend = backend
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.trim_every = trim_every
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        value = self.backend.get(self.namespace, repr(key))
+        with self._lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def put(self, key, value):
+        self.backend.set(self.namespace, repr(key), bytes(value))
+        with self._lock:
+            self._puts += 1
+            trim = self._puts % self.trim_every == 0
+        if trim:
+            self.backend.trim(self.namespace, self.max_entries)
+
+    def clear(self):
+        self.backend.clear(self.namespace)
+
+    def __len__(self):
+        return self.backend.count(self.namespace)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["entries"] = len(self)
+        return stats
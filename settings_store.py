@@ -0,0 +1,120 @@
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsStore:
+    """Per-user settings in a state backend (see state.py) behind an in-memory read-through cache.
+
+    Reads are served from memory after the first lookup of a user. Writes
+    update the cache immediately and mark the user dirty; a background
+    writer coalesces all dirty users into one backend write every
+    `flush_interval` seconds, so durable writes stay off the handler path.
+    The cache keeps the `max_cached` most recently used users; users with
+    unflushed changes are only evicted once written.
+    """
+
+    def __init__(self, backend, defaults, flush_interval=1.0, namespace="settings", max_cached=10000):
+        self.backend = backend
+        self.defaults = dict(defaults)
+        self.flush_interval = flush_interval
+        self.namespace = namespace
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load(self, user_id):
+        settings = dict(self.defaults)
+        settings.update(self.backend.get(self.namespace, user_id) or {})
+        return settings
+
+    def _evict(self):
+        """Drop least recently used clean users beyond max_cached (call with the lock held)"""
+        excess = len(self._cache) - self.max_cached
+        if excess <= 0:
+            return
+        victims = []
+        for user_id in self._cache:
+            if len(victims) >= excess:
+                break
+            if user_id not in self._dirty:
+                victims.append(user_id)
+        for user_id in victims:
+            del self._cache[user_id]
+
+    # ===== READS AND WRITES =====
+    def get(self, user_id):
+        """Return a copy of a user's settings, filled in with defaults"""
+        with self._lock:
+            settings = self._cache.get(user_id)
+            if settings is not None:
+                self._cache.move_to_end(user_id)
+        if settings is None:
+            loaded = self._load(user_id)
+            with self._lock:
+                settings = self._cache.setdefault(user_id, loaded)
+                self._evict()
+        return dict(settings)
+
+    def get_value(self, user_id, name):
+        return self.get(user_id)[name]
+
+    def set(self, user_id, **values):
+        """Update settings in memory; the write reaches the backend on the next flush"""
+        unknown = set(values) - set(self.defaults)
+        if unknown:
+            raise KeyError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        current = self.get(user_id)
+        current.update(values)
+        with self._lock:
+            self._cache[user_id] = current
+            self._cache.move_to_end(user_id)
+            self._dirty.add(user_id)
+            self._evict()
+        if self._thread is None:
+            # No background writer running: write through
+            self.flush()
+        return dict(current)
+
+    def flush(self):
+        """Write every dirty user in one batch"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = {user_id: dict(self._cache[user_id]) for user_id in dirty}
+        if not rows:
+            return 0
+        try:
+            self.backend.set_many(self.namespace, rows)
+        except Exception as e:
+            logger.error(f"Settings flush failed, will retry: {e}")
+            with self._lock:
+                self._dirty.update(dirty)
+            return 0
+        with self._lock:
+            self._evict()
+        return len(rows)
+
+    # ===== LIFECYCLE =====
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="settings-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the writer and flush whatever is still pending"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
@@ -0,0 +1,49 @@
+import threading
+from contextlib import contextmanager
+
+
+class SingleFlight:
+    """Tracks keys with work in flight so duplicates can be turned away.
+
+    Safe to share between handler threads and an asyncio loop: the
+    bookkeeping is a set guarded by a lock and never blocks on the work
+    itself.
+    """
+
+    def __init__(self):
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stats = {"started": 0, "coalesced": 0}
+
+    def acquire(self, key):
+        """Claim `key`; False if the same work is already running"""
+        with self._lock:
+            if key in self._in_flight:
+                self._stats["coalesced"] += 1
+                return False
+            self._in_flight.add(key)
+            self._stats["started"] += 1
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._in_flight.discard(key)
+
+    @contextmanager
+    def claim(self, key):
+        """Context manager yielding whether `key` was claimed; released on exit"""
+        claimed = self.acquire(key)
+        try:
+            yield claimed
+        finally:
+            if claimed:
+                self.release(key)
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._in_flight)
+        return stats
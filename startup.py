@@ -0,0 +1,160 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _process_started():
+    """perf_counter() value at process start on Linux, or now elsewhere"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesised command name start at field 3; starttime is field 22
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.perf_counter() - max(0.0, uptime - started)
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter()
+
+
+# ===== IMPORT PROFILING =====
+class _TimedLoader:
+    """Wraps a module loader to time exec_module, delegating everything else"""
+
+    def __init__(self, loader, name, profiler):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._enter()
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(self._name, time.perf_counter() - start)
+
+
+class ImportProfiler:
+    """Meta path hook timing module imports, an in-process `-X importtime`.
+
+    For every module imported while installed it records the cumulative
+    import time (including nested imports) and its own share. Modules
+    imported directly by the code that installed it are the roots of the
+    breakdown. Meant for the startup window only: uninstall() once the
+    imports are done.
+    """
+
+    def __init__(self):
+        self.times = {}
+        self.roots = []
+        self._local = threading.local()
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, name, self)
+        return spec
+
+    def _enter(self):
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+
+    def _exit(self, name, elapsed):
+        stack = self._local.stack
+        nested = stack.pop()
+        self.times[name] = (elapsed, elapsed - nested)
+        if stack:
+            stack[-1] += elapsed
+        else:
+            self.roots.append(name)
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def slowest(self, limit=8):
+        """(module, cumulative seconds, self seconds) of the slowest root imports"""
+        rows = [(name, *self.times[name]) for name in self.roots]
+        return sorted(rows, key=lambda row: row[1], reverse=True)[:limit]
+
+
+# ===== STARTUP TIMELINE =====
+class StartupTimer:
+    """Named milestones measured from process start, plus the first update.
+
+    mark(name) records how long after process start a milestone was reached;
+    report() turns them (and an optional import breakdown) into one log line.
+    """
+
+    def __init__(self):
+        self.started = _process_started()
+        self.marks = {}
+        self.imports = None
+        self._lock = threading.Lock()
+
+    def profile_imports(self):
+        """Start timing imports (call before the imports to be measured)"""
+        self.imports = ImportProfiler().install()
+        return self.imports
+
+    def mark(self, name):
+        with self._lock:
+            self.marks.setdefault(name, time.perf_counter() - self.started)
+        if name == "imports" and self.imports is not None:
+            self.imports.uninstall()
+
+    def first_update(self):
+        """Mark (and log, once) the arrival of the first update"""
+        with self._lock:
+            if "first_update" in self.marks:
+                return
+            elapsed = self.marks["first_update"] = time.perf_counter() - self.started
+        logger.info(f"First update {elapsed:.2f}s after process start")
+
+    def watch_updates(self, process_updates):
+        """Wrap a process_new_updates function to mark the first non-empty batch"""
+        def wrapper(updates, *args, **kwargs):
+            if updates:
+                self.first_update()
+            return process_updates(updates, *args, **kwargs)
+        return wrapper
+
+    def report(self):
+        with self._lock:
+            marks = sorted(self.marks.items(), key=lambda item: item[1])
+        timeline = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in marks)
+        text = f"Startup: {timeline or 'no milestones yet'}"
+        if self.imports is not None:
+            slowest = ", ".join(
+                f"{name} {total * 1000:.0f}ms (self {own * 1000:.0f}ms)" for name, total, own in self.imports.slowest()
+            )
+            text += f"; slowest imports: {slowest}"
+        return text
+
+    def stats(self):
+        with self._lock:
+            return dict(self.marks)
+
+
+timer = StartupTimer()
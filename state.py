@@ -0,0 +1,202 @@
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """In-process state backend: one LRU-ordered dict per namespace.
+
+    Backends store arbitrary picklable values under (namespace, key) and
+    offer an atomic read-modify-write via transact(). This one is shared by
+    the threads of one process; use SQLiteBackend to share state between
+    processes.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def _namespace(self, namespace):
+        return self._data.setdefault(namespace, OrderedDict())
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            entries = self._namespace(namespace)
+            if key not in entries:
+                return default
+            entries.move_to_end(key)
+            return entries[key]
+
+    def set_many(self, namespace, items):
+        with self._lock:
+            entries = self._namespace(namespace)
+            for key, value in items.items():
+                entries[key] = value
+                entries.move_to_end(key)
+            if self.max_entries:
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+
+    def set(self, namespace, key, value):
+        self.set_many(namespace, {key: value})
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._namespace(namespace).pop(key, None)
+
+    def clear(self, namespace):
+        with self._lock:
+            self._namespace(namespace).clear()
+
+    def transact(self, namespace, keys, fn):
+        """Atomically call fn({key: value or None}) -> (updates, result), store updates, return result"""
+        with self._lock:
+            current = {key: self.get(namespace, key) for key in keys}
+            updates, result = fn(current)
+            if updates:
+                self.set_many(namespace, updates)
+            return result
+
+    def trim(self, namespace, max_entries):
+        with self._lock:
+            entries = self._namespace(namespace)
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def count(self, namespace):
+        with self._lock:
+            return len(self._namespace(namespace))
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """State backend in one SQLite file (WAL mode), shared by every process that opens it.
+
+    transact() runs under BEGIN IMMEDIATE, so read-modify-write updates such
+    as rate-limit buckets are atomic across processes. Values are pickled.
+    """
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    # ===== DATABASE =====
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None,
+                                   timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _write(self, conn, namespace, items):
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO state (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+            [(namespace, str(key), pickle.dumps(value), now) for key, value in items.items()]
+        )
+
+    def _in_transaction(self, work):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    # ===== OPERATIONS =====
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, str(key))
+            ).fetchone()
+        return pickle.loads(row[0]) if row else default
+
+    def set_many(self, namespace, items):
+        if items:
+            self._in_transaction(lambda conn: self._write(conn, namespace, items))
+
+    def set(self, namespace, key, value):
+        self.set_many(namespace, {key: value})
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._connection().execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, str(key)))
+
+    def clear(self, namespace):
+        with self._lock:
+            self._connection().execute("DELETE FROM state WHERE namespace = ?", (namespace,))
+
+    def transact(self, namespace, keys, fn):
+        """Atomically call fn({key: value or None}) -> (updates, result), store updates, return result"""
+        def work(conn):
+            current = {}
+            for key in keys:
+                row = conn.execute(
+                    "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, str(key))
+                ).fetchone()
+                current[key] = pickle.loads(row[0]) if row else None
+            updates, result = fn(current)
+            if updates:
+                self._write(conn, namespace, updates)
+            return result
+        return self._in_transaction(work)
+
+    def trim(self, namespace, max_entries):
+        """Drop the least recently written entries beyond `max_entries`"""
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM state WHERE namespace = ? AND key NOT IN ("
+                "SELECT key FROM state WHERE namespace = ? ORDER BY updated_at DESC LIMIT ?)",
+                (namespace, namespace, max_entries)
+            )
+
+    def count(self, namespace):
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM state WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+BACKENDS = {
+    "memory": lambda path: MemoryBackend(max_entries=100000),
+    "sqlite": SQLiteBackend,
+}
+
+
+def open_backend(kind, path=None):
+    """Create a backend by name ("memory" or "sqlite")"""
+    try:
+        factory = BACKENDS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown state backend {kind!r}, expected one of: {', '.join(BACKENDS)}")
+    return factory(path)
@@ -0,0 +1,59 @@
+import threading
+
+from cluster import HashRing, KeyedWorkers, update_user_id
+
+
+def test_ring_is_stable_and_spreads_keys():
+    ring = HashRing(range(4))
+    assignment = {key: ring.node_for(key) for key in range(2000)}
+    assert assignment == {key: HashRing(range(4)).node_for(key) for key in range(2000)}
+    counts = [list(assignment.values()).count(node) for node in range(4)]
+    assert min(counts) > 2000 / 4 / 2
+
+
+def test_removing_a_node_only_moves_its_keys():
+    before = HashRing(range(4))
+    after = HashRing([0, 1, 2])
+    for key in range(2000):
+        if before.node_for(key) != 3:
+            assert after.node_for(key) == before.node_for(key)
+
+
+def test_update_user_id():
+    user = {"id": 7, "is_bot": False, "first_name": "U"}
+    assert update_user_id({"update_id": 1, "message": {"from": user, "chat": {"id": 9}}}) == 7
+    assert update_user_id({"update_id": 1, "callback_query": {"from": user}}) == 7
+    assert update_user_id({"update_id": 1, "channel_post": {"chat": {"id": 9}}}) == 1
+    assert update_user_id({"update_id": 1, "chat_member": {"chat": {"id": 9}}}) == 9
+
+
+def test_keyed_workers_keep_per_key_order():
+    seen = {}
+    lock = threading.Lock()
+
+    def handle(item):
+        key, number = item
+        with lock:
+            seen.setdefault(key, []).append(number)
+
+    workers = KeyedWorkers(handle, workers=4, max_queue=1000)
+    for number in range(100):
+        for key in range(10):
+            workers.submit(key, (key, number))
+    workers.stop(10)
+    assert seen == {key: list(range(100)) for key in range(10)}
+
+
+def test_keyed_workers_survive_handler_errors():
+    done = []
+
+    def handle(item):
+        if item == "bad":
+            raise ValueError(item)
+        done.append(item)
+
+    workers = KeyedWorkers(handle, workers=1)
+    workers.submit(1, "bad")
+    workers.submit(1, "good")
+    workers.stop(10)
+    assert done == ["good"]
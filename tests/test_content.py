@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+import content
+from content import ContentPool, contact_batch, device_batch, location_batch, seed_value
+
+BATCHES = [location_batch, contact_batch, device_batch]
+
+
+@pytest.fixture(params=["numpy", "random"])
+def backend(request, monkeypatch):
+    """Run a test against NumPy Generators and against the random.Random fallback"""
+    if request.param == "numpy":
+        if content.np is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(content, "np", None)
+    return request.param
+
+
+def take(pool, n):
+    return [pool.take() for _ in range(n)]
+
+
+def test_seed_value():
+    assert seed_value(None) is None
+    assert seed_value("42") == 42
+    assert seed_value(7) == 7
+    for seed in ("abc", "-1", "1.5", ""):
+        value = seed_value(seed)
+        assert isinstance(value, int) and value >= 0
+        assert value == seed_value(seed)
+    assert seed_value("abc") != seed_value("abd")
+
+
+@pytest.mark.parametrize("batch", BATCHES)
+def test_seeded_pools_repeat(backend, batch):
+    first = ContentPool("test", batch, batch_size=8, low_water=2, seed="42")
+    second = ContentPool("test", batch, batch_size=8, low_water=2, seed="42")
+    # Several batches, so background refills are part of the sequence
+    assert take(first, 30) == take(second, 30)
+
+
+@pytest.mark.parametrize("seed", ["abc", "-1"])
+def test_non_integer_seeds_are_reproducible(backend, seed):
+    first = ContentPool("test", location_batch, batch_size=4, seed=seed)
+    second = ContentPool("test", location_batch, batch_size=4, seed=seed)
+    assert take(first, 10) == take(second, 10)
+
+
+def test_streams_and_seeds_differ(backend):
+    base = take(ContentPool("test", location_batch, batch_size=8, seed=1, stream=0), 8)
+    assert take(ContentPool("test", location_batch, batch_size=8, seed=1, stream=1), 8) != base
+    assert take(ContentPool("test", location_batch, batch_size=8, seed=2, stream=0), 8) != base
+
+
+def test_batch_values_in_range(backend):
+    rng = content.make_rng(3)
+    for lat, lon in location_batch(rng, 100):
+        assert -90 <= lat <= 90 and -180 <= lon <= 180
+    for phone, email in contact_batch(rng, 100):
+        assert phone.startswith("+1") and len(phone) == 12
+        assert email.startswith("user") and email.endswith("@example.com")
+    for device, os_version, battery, signal, storage in device_batch(rng, 100):
+        assert device in content.DEVICES and os_version in content.OS_VERSIONS
+        assert 20 <= battery <= 100 and 1 <= signal <= 5 and 32 <= storage <= 512
+
+
+def test_take_raises_when_fill_fails():
+    def broken(rng, n):
+        raise RuntimeError("no content")
+
+    pool = ContentPool("broken", broken, batch_size=4)
+    result = {}
+
+    def run():
+        try:
+            pool.take()
+        except RuntimeError as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), "take() kept retrying a failing fill"
+    assert str(result["error"]) == "no content"
+    # The failed inline fill must not leave the pool marked as refilling
+    assert not pool._refilling
+
+
+def test_stats_count_takes_and_batches():
+    pool = ContentPool("test", location_batch, batch_size=4, low_water=0, seed=5)
+    take(pool, 6)
+    stats = pool.stats()
+    assert stats["taken"] == 6
+    assert stats["batches"] == 2
+    assert stats["available"] == 2
+
+
+def test_batch_size_must_be_positive():
+    with pytest.raises(ValueError):
+        ContentPool("test", location_batch, batch_size=0)
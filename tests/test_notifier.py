@@ -0,0 +1,49 @@
+from notifier import MAX_MESSAGE_LENGTH, AdminNotifier
+
+
+class RecordingBot:
+    def __init__(self):
+        self.calls = []
+
+    def send_message(self, chat_id, text):
+        self.calls.append(("send_message", chat_id, text))
+
+    def send_photo(self, chat_id, photo, caption=None):
+        self.calls.append(("send_photo", chat_id, photo))
+
+    def send_media_group(self, chat_id, media):
+        self.calls.append(("send_media_group", chat_id, len(media)))
+
+
+def test_digest_chunks_respect_the_length_limit():
+    texts = ["a" * 3000, "b" * 3000, "c", "d" * 5000]
+    chunks = AdminNotifier._digest_chunks(texts)
+    assert [count for _, count in chunks] == [1, 2, 1]
+    assert all(len(chunk) <= MAX_MESSAGE_LENGTH for chunk, _ in chunks)
+    assert chunks[1][0] == "b" * 3000 + "\n\nc"
+
+
+def test_flush_counts_each_notification_once_per_admin():
+    bot = RecordingBot()
+    notifier = AdminNotifier(bot, [1, 2])
+    texts = [("text", "a" * 3000, None), ("text", "b" * 3000, None), ("text", "c", None)]
+    photos = [("photo", f"file{i}", None) for i in range(11)]
+    notifier._flush(texts + photos)
+    per_admin = [call for call in bot.calls if call[1] == 1]
+    assert [call[0] for call in per_admin] == ["send_message", "send_message", "send_media_group", "send_photo"]
+    assert notifier.stats()["sent"] == 2 * (3 + 11)
+
+
+def test_stop_drains_the_queue():
+    bot = RecordingBot()
+    notifier = AdminNotifier(bot, [1], digest_interval=60).start()
+    notifier.notify_text("hello")
+    notifier.stop(5)
+    assert bot.calls == [("send_message", 1, "hello")]
+    assert notifier.stats()["queued"] == 1
+
+
+def test_nothing_is_queued_without_admins():
+    notifier = AdminNotifier(RecordingBot(), [])
+    assert not notifier.notify_text("hello")
+    assert notifier.stats()["queued"] == 0
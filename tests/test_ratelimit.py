@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from ratelimit import RateLimiter, parse_limit
+from state import SQLiteBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("0.5:10", (0.5, 10.0)),
+    ("2", (2.0, 2.0)),
+    ("0.2", (0.2, 1.0)),
+    ("0", None),
+    ("off", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_limit(value, expected):
+    assert parse_limit(value) == expected
+
+
+def test_burst_then_refill():
+    clock = Clock()
+    limiter = RateLimiter({"user": (1.0, 3.0)}, clock=clock)
+    assert [limiter.acquire(user=1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire(user=1) == pytest.approx(1.0)
+    # Other users have their own bucket
+    assert limiter.acquire(user=2) == 0.0
+    clock.now += 1.0
+    assert limiter.acquire(user=1) == 0.0
+    assert limiter.stats()["limited"] == 1
+
+
+def test_rejected_request_charges_no_bucket():
+    clock = Clock()
+    limiter = RateLimiter({"user": (1.0, 5.0), "global": (1.0, 1.0)}, clock=clock)
+    assert limiter.acquire(user=1, **{"global": 0}) == 0.0
+    # The global bucket is empty, so the user bucket must keep its 4 tokens
+    assert limiter.acquire(user=1, **{"global": 0}) > 0
+    clock.now += 1.0
+    assert [limiter.acquire(user=1) for _ in range(5)] == [0.0] * 5
+
+
+def test_cost_above_burst_waits_for_a_full_bucket():
+    clock = Clock()
+    limiter = RateLimiter({"user": (1.0, 2.0)}, clock=clock)
+    assert limiter.acquire(cost=5, user=1) == 0.0
+    assert limiter.acquire(cost=5, user=1) == pytest.approx(2.0)
+
+
+def test_unlimited_scopes_are_ignored():
+    limiter = RateLimiter({"user": None, "chat": (1.0, 1.0)})
+    assert all(limiter.acquire(user=1) == 0.0 for _ in range(10))
+
+
+def test_shared_backend_is_atomic(tmp_path):
+    backend = SQLiteBackend(tmp_path / "state.db")
+    clock = Clock()
+    limiters = [RateLimiter({"user": (0.001, 10.0)}, backend=backend, clock=clock) for _ in range(2)]
+    allowed = []
+
+    def hammer(limiter):
+        for _ in range(20):
+            allowed.append(limiter.acquire(user=1) == 0.0)
+
+    threads = [threading.Thread(target=hammer, args=(limiter,)) for limiter in limiters for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    backend.close()
+    assert allowed.count(True) == 10
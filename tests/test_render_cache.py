@@ -0,0 +1,43 @@
+from render_cache import BackendByteCache, ByteLRUCache
+from state import MemoryBackend
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = ByteLRUCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    # "b" is now the least recently used entry and makes room for "c"
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    assert cache.stats() == {"hits": 3, "misses": 1, "evictions": 1, "entries": 2, "bytes": 8}
+
+
+def test_replacing_an_entry_updates_the_size():
+    cache = ByteLRUCache(max_bytes=10)
+    cache.put("a", b"12345678")
+    cache.put("a", b"12")
+    assert cache.stats()["bytes"] == 2
+    cache.put("b", b"12345678")
+    assert len(cache) == 2
+
+
+def test_oversized_values_are_not_cached():
+    cache = ByteLRUCache(max_bytes=4)
+    cache.put("a", b"1234")
+    cache.put("big", b"12345")
+    assert cache.get("big") is None
+    assert cache.get("a") == b"1234"
+
+
+def test_backend_cache_round_trip_and_trim():
+    cache = BackendByteCache(MemoryBackend(), max_entries=2, trim_every=4)
+    cache.put(("front", "user", 1), bytearray(b"jpeg"))
+    assert cache.get(("front", "user", 1)) == b"jpeg"
+    assert cache.get(("front", "user", 2)) is None
+    for i in range(3):
+        cache.put(i, b"x")
+    # The fourth put trims the namespace down to max_entries
+    assert len(cache) == 2
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 2}
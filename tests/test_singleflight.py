@@ -0,0 +1,52 @@
+import threading
+
+from singleflight import SingleFlight
+
+
+def test_duplicate_key_is_turned_away_until_released():
+    flight = SingleFlight()
+    assert flight.acquire(("user", "auto_front"))
+    assert not flight.acquire(("user", "auto_front"))
+    assert flight.acquire(("user", "auto_back"))
+    flight.release(("user", "auto_front"))
+    assert flight.acquire(("user", "auto_front"))
+    assert flight.stats() == {"started": 3, "coalesced": 1, "in_flight": 2}
+
+
+def test_claim_releases_only_what_it_claimed():
+    flight = SingleFlight()
+    with flight.claim("k") as first:
+        assert first
+        with flight.claim("k") as second:
+            assert not second
+        # The refused inner claim must not release the outer one
+        assert len(flight) == 1
+    assert len(flight) == 0
+
+
+def test_claim_releases_on_error():
+    flight = SingleFlight()
+    try:
+        with flight.claim("k"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert flight.acquire("k")
+
+
+def test_one_winner_under_contention():
+    flight = SingleFlight()
+    start = threading.Barrier(16)
+    results = []
+
+    def race():
+        start.wait()
+        results.append(flight.acquire("k"))
+
+    threads = [threading.Thread(target=race) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+    assert flight.stats()["coalesced"] == 15
@@ -0,0 +1,108 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from state import MemoryBackend, SQLiteBackend, open_backend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    backend = open_backend(request.param, tmp_path / "state.db")
+    yield backend
+    backend.close()
+
+
+def _increment(current):
+    return {"n": (current["n"] or 0) + 1}, current["n"]
+
+
+def test_get_set_delete(backend):
+    assert backend.get("ns", "k") is None
+    assert backend.get("ns", "k", default=0) == 0
+    backend.set("ns", "k", {"value": [1, 2]})
+    assert backend.get("ns", "k") == {"value": [1, 2]}
+    assert backend.get("other", "k") is None
+    backend.delete("ns", "k")
+    assert backend.count("ns") == 0
+
+
+def test_transact_stores_updates_and_returns_result(backend):
+    assert backend.transact("ns", ["n"], _increment) is None
+    assert backend.transact("ns", ["n"], _increment) == 1
+    assert backend.get("ns", "n") == 2
+
+
+def test_transact_without_updates_writes_nothing(backend):
+    assert backend.transact("ns", ["a", "b"], lambda current: (None, current)) == {"a": None, "b": None}
+    assert backend.count("ns") == 0
+
+
+def test_failed_transaction_is_rolled_back(backend):
+    backend.set("ns", "n", 1)
+
+    def fail(current):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        backend.transact("ns", ["n"], fail)
+    # The backend stays usable and unchanged
+    assert backend.transact("ns", ["n"], _increment) == 1
+    assert backend.get("ns", "n") == 2
+
+
+def test_transact_is_atomic_across_threads(backend):
+    def work():
+        for _ in range(50):
+            backend.transact("ns", ["n"], _increment)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.get("ns", "n") == 200
+
+
+def _increment_in_process(path, times):
+    backend = SQLiteBackend(path)
+    for _ in range(times):
+        backend.transact("ns", ["n"], _increment)
+    backend.close()
+
+
+def test_sqlite_transact_is_atomic_across_processes(tmp_path):
+    path = tmp_path / "state.db"
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_increment_in_process, args=(path, 50)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+    assert [process.exitcode for process in processes] == [0, 0]
+    backend = SQLiteBackend(path)
+    assert backend.get("ns", "n") == 100
+    backend.close()
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("ns", "a", 1)
+    backend.set("ns", "b", 2)
+    backend.get("ns", "a")
+    backend.set("ns", "c", 3)
+    assert backend.get("ns", "b") is None
+    assert backend.get("ns", "a") == 1 and backend.get("ns", "c") == 3
+
+
+def test_trim_keeps_the_newest(backend):
+    for i in range(5):
+        backend.set("ns", f"k{i}", i)
+    backend.trim("ns", 2)
+    assert backend.count("ns") == 2
+    assert backend.get("ns", "k4") == 4
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        open_backend("redis")
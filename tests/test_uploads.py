@@ -0,0 +1,77 @@
+import io
+from email.parser import BytesParser
+from email.policy import HTTP
+
+import pytest
+
+from uploads import BufferPool, MultipartStream, payload_view
+
+
+def test_pooled_buffer_behaves_like_a_file():
+    pool = BufferPool(buffer_size=4)
+    buffer = pool.acquire()
+    buffer.write(b"hello ")
+    buffer.write(memoryview(b"world"))
+    assert buffer.getvalue() == b"hello world"
+    buffer.seek(0)
+    assert buffer.read() == b"hello world"
+    buffer.seek(-5, io.SEEK_END)
+    buffer.write(b"there")
+    assert buffer.getvalue() == b"hello there"
+    buffer.close()
+
+
+def test_pool_reuses_and_bounds_buffers():
+    pool = BufferPool(max_buffers=1, buffer_size=4, max_pooled_size=64)
+    first, second = pool.acquire(), pool.acquire()
+    first.close()
+    second.close()
+    with pool.acquire() as reused:
+        # A reused buffer starts empty whatever it held before
+        assert reused.getvalue() == b""
+    big = pool.acquire()
+    big.write(bytes(100))
+    big.close()
+    assert pool.stats() == {"acquired": 4, "reused": 2, "allocated": 2, "discarded": 2, "free": 0}
+
+
+def test_payload_view_does_not_copy_buffers():
+    data = bytearray(b"abc")
+    view = payload_view(data)
+    data[0] = ord("x")
+    assert bytes(view) == b"xbc"
+    assert bytes(payload_view(io.BytesIO(b"abc"))) == b"abc"
+
+
+def _read_all(stream, size):
+    chunks = []
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return b"".join(bytes(chunk) for chunk in chunks)
+        chunks.append(chunk)
+
+
+@pytest.mark.parametrize("size", [-1, 1, 7, 4096])
+def test_multipart_stream_body(size):
+    pool = BufferPool()
+    photo = pool.acquire()
+    photo.write(b"\xff\xd8jpeg bytes\xff\xd9")
+    stream = MultipartStream({"photo": ("photo.jpg", photo), "thumb": b"thumb"}, fields={"chat_id": 42})
+    body = _read_all(stream, size)
+    assert len(body) == len(stream)
+
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {stream.content_type}\r\n\r\n".encode() + body
+    )
+    parts = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+    assert parts["chat_id"].get_content() == "42"
+    assert parts["photo"].get_filename() == "photo.jpg"
+    assert parts["photo"].get_payload(decode=True) == b"\xff\xd8jpeg bytes\xff\xd9"
+    assert parts["thumb"].get_payload(decode=True) == b"thumb"
+
+    # Retries rewind the stream and read the same body again
+    stream.seek(0)
+    assert _read_all(stream, size) == body
+    stream.close()
+    photo.close()
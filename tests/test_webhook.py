@@ -0,0 +1,53 @@
+import json
+
+import pytest
+import requests
+
+from webhook import SECRET_HEADER, WebhookServer
+
+UPDATE = {"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 5, "type": "private"}, "text": "hi"}}
+
+
+@pytest.fixture
+def server():
+    received = []
+
+    def dispatch(update):
+        received.append(update)
+        return update["update_id"] != 503
+
+    server = WebhookServer(None, host="127.0.0.1", port=0, path="/hook", secret_token="s3cret", dispatch=dispatch)
+    server.received = received
+    server.url = f"http://127.0.0.1:{server.address[1]}"
+    server.start()
+    yield server
+    server.shutdown(5)
+
+
+def post(server, body, secret="s3cret", path="/hook"):
+    headers = {SECRET_HEADER: secret} if secret is not None else {}
+    return requests.post(server.url + path, data=json.dumps(body), headers=headers, timeout=5).status_code
+
+
+def test_accepts_updates_with_the_secret(server):
+    assert post(server, UPDATE) == 200
+    assert server.received == [UPDATE]
+
+
+@pytest.mark.parametrize("secret", [None, "", "wrong", "s3cret "])
+def test_rejects_a_missing_or_wrong_secret(server, secret):
+    assert post(server, UPDATE, secret=secret) == 403
+    assert server.received == []
+    assert server.stats()["rejected"] == 1
+
+
+def test_rejects_bad_bodies_and_paths(server):
+    assert post(server, UPDATE, path="/other") == 404
+    assert post(server, {"no": "update"}) == 400
+    assert post(server, [1, 2]) == 400
+    assert server.received == []
+
+
+def test_answers_503_when_dispatch_is_full(server):
+    assert post(server, dict(UPDATE, update_id=503)) == 503
+    assert server.stats()["shed"] == 1
@@ -0,0 +1,83 @@
+import functools
+import logging
+
+from lazy import LazyModule, optional_module
+
+# Both load on first use; without NumPy installed callers fall back to flat fills
+Image = LazyModule("PIL.Image")
+np = optional_module("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Side of the square noise tile repeated across the image
+TILE_SIZE = 256
+
+
+def available():
+    return np is not None
+
+
+# ===== PRECOMPUTED LAYERS =====
+# Every layer is computed once per (size, parameters) and reused read-only,
+# so building a scene is a few whole-array multiply/add passes.
+@functools.lru_cache(maxsize=16)
+def noise_tile(amplitude, seed, tile=TILE_SIZE):
+    """Gaussian sensor-like grain, one value per pixel shared by all channels"""
+    rng = np.random.default_rng(seed)
+    layer = rng.normal(0.0, amplitude, (tile, tile, 1)).astype(np.float32)
+    layer.flags.writeable = False
+    return layer
+
+
+@functools.lru_cache(maxsize=16)
+def vignette(width, height, strength):
+    """Multiplier falling off from 1.0 in the centre towards the corners"""
+    y = np.linspace(-1.0, 1.0, height, dtype=np.float32)[:, None]
+    x = np.linspace(-1.0, 1.0, width, dtype=np.float32)[None, :]
+    layer = 1.0 - strength * np.clip((x * x + y * y) / 2.0, 0.0, 1.0)
+    layer = layer[:, :, None]
+    layer.flags.writeable = False
+    return layer
+
+
+@functools.lru_cache(maxsize=16)
+def blotches(width, height, cells, seed):
+    """Smooth low-frequency variation around 0: a coarse random grid upscaled bicubically"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.random((max(2, cells * height // width), cells), dtype=np.float32) - 0.5
+    smooth = Image.fromarray(coarse).resize((width, height), Image.BICUBIC)
+    layer = np.asarray(smooth, dtype=np.float32)[:, :, None]
+    layer.flags.writeable = False
+    return layer
+
+
+def _tiled(tile, width, height):
+    reps = (-(-height // tile.shape[0]), -(-width // tile.shape[1]), 1)
+    return np.tile(tile, reps)[:height, :width]
+
+
+# ===== SCENES =====
+def scene(size, top, bottom, seed=0, noise=0.0, vignette_strength=0.35, blotch=0.25, cells=6):
+    """Gradient from `top` to `bottom` colour with blotches, vignette and optional grain.
+
+    The layers are combined in one float32 array, converted to uint8 once
+    and copied into a new RGB image. Pillow can only map RGBX/RGBA buffers
+    without a copy, and such a mapped image is read-only: the camera chrome
+    drawn onto it right after would copy it again anyway.
+    """
+    width, height = size
+    t = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    top = np.asarray(top, dtype=np.float32)
+    bottom = np.asarray(bottom, dtype=np.float32)
+
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[:] = top + (bottom - top) * t
+    if blotch:
+        pixels *= 1.0 + blotch * blotches(width, height, cells, seed)
+    if vignette_strength:
+        pixels *= vignette(width, height, vignette_strength)
+    if noise:
+        pixels += _tiled(noise_tile(noise, seed), width, height)
+
+    out = np.clip(pixels, 0, 255, out=pixels).astype(np.uint8)
+    return Image.fromarray(out)
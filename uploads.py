@@ -0,0 +1,211 @@
+import functools
+import io
+import os
+import threading
+import uuid
+
+# Buffers start big enough for a typical encoded photo
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# Larger buffers are dropped on release instead of being pooled
+MAX_POOLED_SIZE = 8 * 1024 * 1024
+
+
+class PooledBuffer(io.RawIOBase):
+    """Growable write buffer over a reusable bytearray; close() hands it back to its pool.
+
+    Pillow encodes straight into it, and getbuffer() exposes the written bytes
+    as a memoryview so the upload can send them without copying.
+    """
+
+    def __init__(self, pool, data):
+        super().__init__()
+        self._pool = pool
+        self._data = data
+        self._size = 0
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def write(self, b):
+        view = memoryview(b).cast("B")
+        end = self._pos + len(view)
+        if end > len(self._data):
+            self._data.extend(bytes(max(end, 2 * len(self._data)) - len(self._data)))
+        self._data[self._pos:end] = view
+        self._pos = end
+        self._size = max(self._size, end)
+        return len(view)
+
+    def readinto(self, b):
+        n = min(len(b), self._size - self._pos)
+        b[:n] = memoryview(self._data)[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def getbuffer(self):
+        """Zero-copy view of the written bytes; release it before closing the buffer"""
+        return memoryview(self._data)[:self._size]
+
+    def getvalue(self):
+        with self.getbuffer() as view:
+            return bytes(view)
+
+    def close(self):
+        if not self.closed and self._pool is not None:
+            self._pool.release(self)
+        super().close()
+
+
+class BufferPool:
+    """Free list of PooledBuffers, so encoding does not allocate a fresh buffer per photo."""
+
+    def __init__(self, max_buffers=16, buffer_size=DEFAULT_BUFFER_SIZE, max_pooled_size=MAX_POOLED_SIZE):
+        self.max_buffers = max_buffers
+        self.buffer_size = buffer_size
+        self.max_pooled_size = max_pooled_size
+        self._free = []
+        self._lock = threading.Lock()
+        self._stats = {"acquired": 0, "reused": 0, "allocated": 0, "discarded": 0}
+
+    def acquire(self):
+        with self._lock:
+            self._stats["acquired"] += 1
+            data = self._free.pop() if self._free else None
+            if data is None:
+                self._stats["allocated"] += 1
+            else:
+                self._stats["reused"] += 1
+        return PooledBuffer(self, data if data is not None else bytearray(self.buffer_size))
+
+    def release(self, buffer):
+        # Only the bytearray is kept; the closed buffer object itself is discarded
+        data, buffer._data, buffer._pool = buffer._data, bytearray(), None
+        with self._lock:
+            if len(self._free) < self.max_buffers and len(data) <= self.max_pooled_size:
+                self._free.append(data)
+            else:
+                self._stats["discarded"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["free"] = len(self._free)
+        return stats
+
+
+# ===== STREAMING MULTIPART =====
+def payload_view(value):
+    """Bytes-like view of an upload without copying it where possible"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return memoryview(value)
+    if isinstance(value, PooledBuffer):
+        return value.getbuffer()
+    if isinstance(value, io.BytesIO):
+        # getvalue() of an unmodified BytesIO(data) returns `data` itself
+        return memoryview(value.getvalue())
+    return memoryview(value.read())
+
+
+class MultipartStream:
+    """multipart/form-data body read part by part from the original buffers.
+
+    requests/urllib3 treat it as a file-like body with a known length and
+    send it in blocks, so the file payloads are never joined into one
+    bytes object.
+    """
+
+    def __init__(self, files, fields=None):
+        self.boundary = uuid.uuid4().hex
+        self._views = []
+        parts = []
+        for name, value in (fields or {}).items():
+            parts.append(self._header(name) + str(value).encode() + b"\r\n")
+        for name, value in files.items():
+            filename = name
+            if isinstance(value, tuple):
+                filename, value = value[0], value[1]
+            view = payload_view(value)
+            self._views.append(view)
+            parts.extend([self._header(name, filename), view, b"\r\n"])
+        parts.append(f"--{self.boundary}--\r\n".encode())
+        self._parts = [memoryview(part) if isinstance(part, bytes) else part for part in parts]
+        self._length = sum(len(part) for part in self._parts)
+        self.seek(0)
+
+    def _header(self, name, filename=None):
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        return f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(self._parts)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # Rewinding is all retries need
+        self._index, self._offset = 0, 0
+        return 0
+
+    def tell(self):
+        return sum(len(part) for part in self._parts[:self._index]) + self._offset
+
+    def read(self, size=-1):
+        """Return the next slice of the current part (a memoryview, at most `size` bytes)"""
+        while self._index < len(self._parts):
+            part = self._parts[self._index]
+            if self._offset < len(part):
+                end = len(part) if size is None or size < 0 else min(len(part), self._offset + size)
+                chunk = part[self._offset:end]
+                self._offset = end
+                return chunk
+            self._index, self._offset = self._index + 1, 0
+        return b""
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+
+
+def stream_uploads(session):
+    """Send requests.Session file uploads as a streamed MultipartStream body"""
+    request = session.request
+
+    @functools.wraps(request)
+    def streaming_request(method, url, files=None, data=None, headers=None, **kwargs):
+        if not files or data:
+            return request(method, url, files=files, data=data, headers=headers, **kwargs)
+        body = MultipartStream(files)
+        headers = dict(headers or {}, **{"Content-Type": body.content_type})
+        try:
+            return request(method, url, data=body, headers=headers, **kwargs)
+        finally:
+            body.close()
+
+    session.request = streaming_request
+    return session
@@ -0,0 +1,193 @@
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from telebot.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def configure_http_pool(pool_size=32, api_url=None, async_runtime=False):
+    """Route every outbound Bot API call through one shared keep-alive session.
+
+    pyTelegramBotAPI otherwise opens a session per thread and recycles it every
+    SESSION_TIME_TO_LIVE seconds. A single pooled session keeps connections
+    to the API warm across all handler threads. `api_url` points the bot at a
+    different Bot API server (a local Bot API server or a test stand-in), in
+    apihelper.API_URL format, e.g. "http://127.0.0.1:8081/bot{0}/{1}".
+
+    AsyncTeleBot talks to the API through its own aiohttp session; with
+    `async_runtime` its connector limit and API URLs are set the same way.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    apihelper.session = session
+    apihelper.SESSION_TIME_TO_LIVE = None
+    file_url = api_url.rsplit("/bot", 1)[0] + "/file/bot{0}/{1}" if api_url else None
+    if api_url:
+        apihelper.API_URL = api_url
+        apihelper.FILE_URL = file_url
+    if async_runtime:
+        # Imported only here: it pulls in aiohttp, which the threaded runtime never needs
+        from telebot import asyncio_helper
+        asyncio_helper.REQUEST_LIMIT = pool_size
+        if api_url:
+            asyncio_helper.API_URL = api_url
+            asyncio_helper.FILE_URL = file_url
+    return session
+
+
+class WebhookServer:
+    """Receives Telegram updates over HTTP and feeds them to the bot's handlers.
+
+    Requests are validated against the webhook secret token, parsed and put
+    on a bounded queue; a fixed set of worker threads runs the handlers. When
+    the queue is full the request is answered with 503 so Telegram retries it
+    later instead of the process buffering without limit.
+
+    With `dispatch` set the server is only an ingress: each raw update dict
+    is handed to dispatch(update), which returns False when it cannot take
+    more, and no local workers are started.
+    """
+
+    def __init__(self, bot, host="0.0.0.0", port=8443, path="/webhook", secret_token=None,
+                 workers=8, max_queue=1000, dispatch=None):
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.dispatch = dispatch
+        self.workers = 0 if dispatch else workers
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._http_thread = None
+        self._lock = threading.Lock()
+        self._stats = {"received": 0, "processed": 0, "rejected": 0, "shed": 0, "errors": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # ===== HTTP SIDE =====
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path != server.path:
+                    return self._reply(404)
+                if server.secret_token and not hmac.compare_digest(
+                        self.headers.get(SECRET_HEADER, ""), server.secret_token):
+                    server._count("rejected")
+                    return self._reply(403)
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    raw = json.loads(self.rfile.read(length))
+                    update = raw if server.dispatch else Update.de_json(raw)
+                    if not isinstance(raw, dict) or "update_id" not in raw:
+                        raise ValueError("not an update")
+                except Exception:
+                    server._count("rejected")
+                    return self._reply(400)
+                server._count("received")
+                accepted = server.dispatch(update) if server.dispatch else server.submit(update)
+                if not accepted:
+                    if server.dispatch:
+                        server._count("shed")
+                    return self._reply(503)
+                self._reply(200)
+
+            def _reply(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def submit(self, update):
+        """Queue an update for the workers; False if the queue is full"""
+        try:
+            self._queue.put_nowait(update)
+            return True
+        except queue.Full:
+            self._count("shed")
+            return False
+
+    # ===== WORKER SIDE =====
+    def _work(self):
+        while True:
+            update = self._queue.get()
+            if update is None:
+                break
+            try:
+                self.bot.process_new_updates([update])
+                self._count("processed")
+            except Exception as e:
+                self._count("errors")
+                logger.error(f"Error processing update {update.update_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        """Start the worker threads and serve HTTP in a background thread"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._http_thread = threading.Thread(target=self.httpd.serve_forever, name="webhook-http", daemon=True)
+        self._http_thread.start()
+        logger.info(f"Webhook server listening on {self.address[0]}:{self.address[1]}{self.path}")
+        return self
+
+    def serve_forever(self):
+        """Serve until stop_serving() or shutdown() is called"""
+        self.start()
+        self._http_thread.join()
+
+    def stop_serving(self):
+        """Make serve_forever() return; safe to call from a signal handler on the serving thread"""
+        threading.Thread(target=self.httpd.shutdown, name="webhook-stop", daemon=True).start()
+
+    def shutdown(self, timeout=10.0):
+        """Stop accepting updates and give the workers `timeout` seconds in total to finish what is queued.
+
+        Returns the number of workers still running afterwards.
+        """
+        deadline = time.monotonic() + timeout
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        running = sum(thread.is_alive() for thread in self._threads)
+        if running:
+            logger.warning(f"{running} webhook workers still busy after {timeout:g}s, {self._queue.qsize()} updates queued")
+        return running
@@ -0,0 +1,131 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedWorkerPool:
+    """Drop-in replacement for telebot's handler ThreadPool with a bounded queue.
+
+    TeleBot hands every update's handler to `worker_pool.put()`. Here the
+    queue holds at most `max_queue` tasks; beyond that (or once draining has
+    started) the task is passed to `on_shed(func, args, kwargs)` instead, so
+    the caller can answer cheaply rather than buffer without limit. Worker
+    threads start on the first task.
+    """
+
+    def __init__(self, bot, workers=8, max_queue=100, on_shed=None):
+        self.bot = bot
+        self.workers = workers
+        self.on_shed = on_shed
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._closing = False
+        self._stats = {"submitted": 0, "completed": 0, "shed": 0, "errors": 0}
+
+        # Polled by TeleBot's polling loop, like ThreadPool's
+        self.exception_event = threading.Event()
+        self.exception_info = None
+
+    # ===== TELEBOT INTERFACE =====
+    def put(self, func, *args, **kwargs):
+        with self._lock:
+            accepted = not self._closing
+            if accepted:
+                try:
+                    self._queue.put_nowait((func, args, kwargs))
+                except queue.Full:
+                    accepted = False
+            if accepted:
+                self._pending += 1
+                self._stats["submitted"] += 1
+                if not self._threads:
+                    self._start()
+            else:
+                self._stats["shed"] += 1
+        if not accepted:
+            self._shed(func, args, kwargs)
+
+    def raise_exceptions(self):
+        if self.exception_event.is_set():
+            raise self.exception_info
+
+    def clear_exceptions(self):
+        self.exception_event.clear()
+
+    def close(self):
+        self.drain()
+
+    # ===== WORKER SIDE =====
+    def _start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"bot-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _shed(self, func, args, kwargs):
+        if self.on_shed is None:
+            return
+        try:
+            self.on_shed(func, args, kwargs)
+        except Exception as e:
+            logger.error(f"Load shedding callback failed: {e}")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            func, args, kwargs = item
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                self._on_exception(e)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                    self._stats["completed"] += 1
+                    if self._pending == 0:
+                        self._idle.notify_all()
+
+    def _on_exception(self, e):
+        with self._lock:
+            self._stats["errors"] += 1
+        handler = getattr(self.bot, "exception_handler", None)
+        handled = handler.handle(e) if handler is not None else False
+        if not handled:
+            logger.error(f"Handler failed: {e}")
+            self.exception_info = e
+            self.exception_event.set()
+
+    # ===== SHUTDOWN =====
+    def drain(self, timeout=30.0):
+        """Stop accepting tasks, wait up to `timeout` seconds for queued and running ones; returns the unfinished count"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._closing = True
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._idle.wait(remaining)
+            unfinished = self._pending
+            threads, self._threads = self._threads, []
+        if unfinished:
+            logger.warning(f"Worker pool drain timed out with {unfinished} tasks unfinished")
+        else:
+            for _ in threads:
+                self._queue.put(None)
+        return unfinished
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+        stats["queued"] = self._queue.qsize()
+        return stats